@@ -0,0 +1,237 @@
+import os
+import re
+import sys
+import json
+import argparse
+
+from datetime import datetime, date, timedelta
+
+from automation_check import (
+    default_mall, GoogleSheetManager, authorize_sheets, chunked, SHIPPING_SHEET_START_ROW,
+)
+from state_store import SHEET_LOCK_PATH, sheet_lock
+from mall_config import MALL_CONFIG_FILE, load_mall_configs
+from metrics import timed
+from log_config import get_logger, setup_logger, KST
+
+
+# 이 일수보다 오래된 완료 행을 보관 워크시트로 옮긴다
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# 보관 대상 주문상태 (쉼표로 구분)
+ARCHIVE_STATUSES = tuple(
+    status.strip() for status in os.getenv("ARCHIVE_STATUSES", "배송완료").split(',') if status.strip()
+)
+# 보관 기준 날짜가 들어있는 열. 시트 헤더에 없으면 행을 지우지 않고 실패한다
+ARCHIVE_DATE_COLUMN = os.getenv("ARCHIVE_DATE_COLUMN", "주문일시")
+# 월별 보관 워크시트 이름 앞부분 (예: market_store_order_archive_2024-01)
+ARCHIVE_SHEET_PREFIX = os.getenv("ARCHIVE_SHEET_PREFIX", "market_store_order_archive_")
+# 한 번 실행에 옮기는 최대 행 수 (오래된 행부터). 잠금을 오래 잡지 않도록 나눠서 옮긴다
+ARCHIVE_MAX_ROWS = int(os.getenv("ARCHIVE_MAX_ROWS", "5000"))
+# append_rows 한 번에 보낼 행 수
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# 스케줄러에서 보관 이동을 실행하는 주기(초). 시트 행을 지우는 작업이라 기본은 꺼져 있다 (비워두거나 0이면 실행하지 않음)
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL") or 0)
+
+SHIPPING_SHEET = 'market_store_order_list'
+# 지우기 직전에 다시 확인하는 열 (스냅샷 이후 바뀐 행은 지우지 않는다)
+VERIFY_COLUMNS = ('마켓주문번호', '스토어주문번호', '주문상태')
+
+# 주문일시 예: "2024-01-01\n(2024-01-01 10:00:00)", "2024.01.01 10:00"
+_DATE_PATTERN = re.compile(r'(\d{4})[-./](\d{1,2})[-./](\d{1,2})')
+
+log = get_logger('archiver')
+
+
+def parse_order_date(value):
+    match = _DATE_PATTERN.search(str(value or ''))
+    if not match:
+        return None
+    try:
+        return date(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def archive_sheet_name(order_date):
+    return f"{ARCHIVE_SHEET_PREFIX}{order_date:%Y-%m}"
+
+
+def _row_key(row):
+    values = [str(value) for value in row]
+    while values and values[-1] == '':
+        values.pop()
+    return tuple(values)
+
+
+def contiguous_ranges(row_nums):
+    """정렬된 행 번호를 연속 구간 (시작, 끝) 목록으로 묶는다."""
+    ranges = []
+    for row_num in sorted(row_nums):
+        if ranges and ranges[-1][1] == row_num - 1:
+            ranges[-1][1] = row_num
+        else:
+            ranges.append([row_num, row_num])
+    return [tuple(row_range) for row_range in ranges]
+
+
+def check_archive_columns(header, date_column=ARCHIVE_DATE_COLUMN):
+    """보관 이동에 필요한 열이 시트 헤더에 모두 있는지 확인한다. 없으면 아무 행도 건드리기 전에 실패한다."""
+    missing = [column for column in dict.fromkeys(('주문상태', date_column, *VERIFY_COLUMNS)) if column not in header]
+    if missing:
+        raise ValueError(
+            f"{SHIPPING_SHEET} 헤더에 보관 이동에 필요한 열이 없습니다: {', '.join(missing)} "
+            f"(ARCHIVE_DATE_COLUMN={date_column})"
+        )
+
+
+def find_archive_rows(values, cutoff, start_row=SHIPPING_SHEET_START_ROW, max_rows=ARCHIVE_MAX_ROWS,
+                      date_column=ARCHIVE_DATE_COLUMN):
+    """보관 대상 행 번호 -> (주문일, 행 값). 주문일이 cutoff 이전인 완료 행을 오래된 순으로 max_rows개까지 고른다."""
+    header = values[0]
+    check_archive_columns(header, date_column)
+    status_idx = header.index('주문상태')
+    date_idx = header.index(date_column)
+
+    candidates = []
+    finished_cnt = 0
+    dated_cnt = 0
+    # start_row 앞의 행은 지우지 않는다. 앞쪽 행을 지우면 뒤의 행이 start_row 위로 올라가 조회에서 빠진다
+    for row_num in range(max(start_row, 2), len(values) + 1):
+        row = values[row_num - 1]
+        if status_idx >= len(row) or row[status_idx] not in ARCHIVE_STATUSES:
+            continue
+        finished_cnt += 1
+        order_date = parse_order_date(row[date_idx] if date_idx < len(row) else '')
+        if order_date is None:
+            continue
+        dated_cnt += 1
+        if order_date >= cutoff:
+            continue
+        candidates.append((order_date, row_num, row))
+
+    # 완료 행이 있는데 날짜를 하나도 읽지 못했다면 날짜 열 설정이 잘못된 것이다
+    if finished_cnt and not dated_cnt:
+        raise ValueError(f"'{date_column}' 열에서 날짜를 읽을 수 없습니다. ARCHIVE_DATE_COLUMN 설정을 확인하세요.")
+
+    candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+    return {row_num: (order_date, row) for order_date, row_num, row in candidates[:max_rows]}
+
+
+@timed('archiver.append_archive_rows')
+def append_archive_rows(sheet_manager, sheet_name, header, rows):
+    """월별 보관 워크시트에 행을 추가한다. 이미 같은 행이 있으면 건너뛰어 다시 실행해도 중복되지 않는다."""
+    worksheet = sheet_manager.get_or_add_worksheet(sheet_name, header)
+    existing = worksheet.get_all_values()
+    archive_header = existing[0] if existing and any(existing[0]) else header
+    archived = {_row_key(row) for row in existing[1:]}
+
+    new_rows = []
+    for row in rows:
+        record = dict(zip(header, row))
+        archive_row = [record.get(column, '') for column in archive_header]
+        if _row_key(archive_row) not in archived:
+            archived.add(_row_key(archive_row))
+            new_rows.append(archive_row)
+
+    for chunk in chunked(new_rows, ARCHIVE_BATCH_SIZE):
+        worksheet.append_rows(chunk)
+    return len(new_rows)
+
+
+# 스냅샷 이후 값이 바뀐 행은 지우지 않도록 확인 열을 한 번에 다시 읽는다
+@timed('archiver.verify_rows')
+def verify_rows(worksheet, header, candidates):
+    from gspread.utils import rowcol_to_a1
+
+    first_row, last_row = min(candidates), max(candidates)
+    columns = [header.index(column) for column in VERIFY_COLUMNS]
+    ranges = [
+        f"{rowcol_to_a1(first_row, col + 1)}:{rowcol_to_a1(last_row, col + 1)}"
+        for col in columns
+    ]
+    column_values = worksheet.batch_get(ranges)
+
+    def cell(values, row_num):
+        offset = row_num - first_row
+        if offset < len(values) and values[offset]:
+            return str(values[offset][0])
+        return ''
+
+    confirmed = []
+    for row_num, (_, row) in candidates.items():
+        if all(cell(values, row_num) == (row[col] if col < len(row) else '')
+               for values, col in zip(column_values, columns)):
+            confirmed.append(row_num)
+        else:
+            log.info(f"{row_num}행이 조회 이후 변경되어 보관 이동하지 않습니다.")
+    return confirmed
+
+
+@timed('archiver.archive_orders')
+def archive_orders(sheet_manager, days=ARCHIVE_AFTER_DAYS, lock_path=SHEET_LOCK_PATH, today=None, dry_run=False,
+                   date_column=ARCHIVE_DATE_COLUMN):
+    """market_store_order_list의 오래된 완료 행을 월별 보관 워크시트로 옮기고 옮긴 행 수를 돌려준다.
+
+    시트 업데이트(process_orders)와 같은 잠금을 잡고 진행하므로 파이프라인과 동시에 실행해도
+    행 번호가 어긋나지 않는다. 보관 워크시트에 먼저 쓰고, 원본 행이 그대로인지 다시 확인한 뒤
+    batch_update 한 번으로 지운다. 중간에 실패해도 다음 실행에서 중복 없이 이어서 옮긴다.
+    """
+    cutoff = (today or datetime.now(KST).date()) - timedelta(days=days)
+    with sheet_lock(lock_path):
+        worksheet = sheet_manager.get_worksheet(SHIPPING_SHEET)
+        values = worksheet.get_all_values()
+        if len(values) < 2:
+            return 0
+        header = values[0]
+        candidates = find_archive_rows(values, cutoff, date_column=date_column)
+        log.info(f"보관 이동 대상: {len(candidates)}행 ({cutoff} 이전, 전체 {len(values) - 1}행)")
+        if not candidates or dry_run:
+            return len(candidates)
+
+        by_month = {}
+        for row_num in sorted(candidates):
+            order_date, row = candidates[row_num]
+            by_month.setdefault(archive_sheet_name(order_date), []).append(row)
+        for sheet_name, rows in sorted(by_month.items()):
+            added = append_archive_rows(sheet_manager, sheet_name, header, rows)
+            log.info(f"{sheet_name}: {added}행 추가 ({len(rows) - added}행은 이미 보관됨)")
+
+        confirmed = verify_rows(worksheet, header, candidates)
+        sheet_manager.delete_row_ranges(SHIPPING_SHEET, contiguous_ranges(confirmed))
+        log.info(f"{SHIPPING_SHEET}에서 {len(confirmed)}행 보관 이동 완료")
+        return len(confirmed)
+
+
+def run_archive(malls=None, gc=None, days=ARCHIVE_AFTER_DAYS, dry_run=False):
+    """몰별로 보관 이동을 실행한다. 한 몰이 실패해도 나머지 몰은 계속 진행하고 마지막에 예외를 낸다."""
+    malls = malls or [default_mall]
+    gc = gc or authorize_sheets()
+    results = {}
+    failures = {}
+    for mall in malls:
+        try:
+            sheet_manager = GoogleSheetManager(mall.sheet_key, gc)
+            results[mall.name] = archive_orders(
+                sheet_manager, days, lock_path=mall.path_for(SHEET_LOCK_PATH), dry_run=dry_run)
+        except Exception as e:
+            log.exception(f"[{mall.name}] 보관 이동 실패: {e}")
+            failures[mall.name] = e
+    if failures:
+        raise RuntimeError(f"보관 이동 실패: {', '.join(f'{name}: {e}' for name, e in failures.items())}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='market_store_order_list의 오래된 완료 행을 월별 워크시트로 보관 이동')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help='이 일수보다 오래된 행을 옮긴다')
+    parser.add_argument('--dry-run', action='store_true', help='대상 행 수만 확인하고 옮기지 않는다')
+    args = parser.parse_args(argv)
+    setup_logger()
+
+    malls = load_mall_configs(MALL_CONFIG_FILE) if MALL_CONFIG_FILE else None
+    results = run_archive(malls, days=args.days, dry_run=args.dry_run)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,27 +1,37 @@
-from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.alert import Alert
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException
-from selenium.common.exceptions import TimeoutException
+# .env 파일 로드 (다른 모듈이 설정 상수를 읽기 전에 한 번만)
+import config
+# selenium, gspread, pandas, google.oauth2는 무거워서 실제로 쓰는 함수 안에서 import한다
 from google.auth.exceptions import TransportError
-from google.oauth2 import service_account
 
 
 import os
+import sys
 import time
-import gspread 
-import pandas as pd
+import asyncio
+import httpx
 import traceback
 import requests
 import json
+import re
 import backoff
-
-# .env 파일 로드
-load_dotenv()
+import logging
+import threading
+import contextvars
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from state_store import (
+    StatusCache, OrderStateStore, STATE_DB_PATH, SHEET_LOCK_PATH, NEAR_COMPLETE_RECHECK_INTERVAL, sheet_lock,
+)
+from run_journal import RunJournal, RUN_JOURNAL_PATH
+from mall_config import MallConfig
+from metrics import metrics, timed, profile_run, PROFILE_MODE
+import run_trace
+from log_config import get_logger, set_log_context
+from contextlib import ExitStack
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+log = get_logger('automation_check')
 
 # 환경 변수 사용
 # mall_id = os.getenv("MALL_ID")
@@ -35,51 +45,129 @@ sheet_key = os.getenv("SHEET_KEY")
 store_api_key = os.getenv("STORE_API_KEY")
 store_basic_url = os.getenv("STORE_BASIC_URL")
 make_hook_url = os.getenv("MAKE_HOOK_URL")
+# 위 환경 변수로 정의되는 기본(단일) 몰
+default_mall = MallConfig(
+    None, username, password, login_page, dashboard_page, shipping_page,
+    sheet_key, store_api_key, make_hook_url
+)
+
+# 불필요한 리소스를 받지 않는 경량 Chrome 모드
+CHROME_LEAN_MODE = os.getenv("CHROME_LEAN_MODE", "true").lower() == "true"
+CHROME_PAGE_LOAD_STRATEGY = os.getenv("CHROME_PAGE_LOAD_STRATEGY", "eager")
+# 경량 모드에서 차단할 URL 패턴 (쉼표 구분). 스타일시트는 요소 클릭 판정에 영향을 줄 수 있어 기본값에서 제외
+CHROME_BLOCKED_URLS = [
+    pattern.strip() for pattern in os.getenv(
+        "CHROME_BLOCKED_URLS",
+        "*.png,*.jpg,*.jpeg,*.gif,*.webp,*.svg,*.ico,*.woff,*.woff2,*.ttf,*.otf,*.mp4,*.webm,"
+        "*google-analytics.com*,*googletagmanager.com*,*doubleclick.net*,*facebook.net*,*channel.io*"
+    ).split(',') if pattern.strip()
+]
+
+# 수동처리 주문 웹훅: 동시 전송 수, 요청 타임아웃(초), 여러 주문을 한 번에 보낼지 여부
+MAKE_HOOK_CONCURRENCY = int(os.getenv("MAKE_HOOK_CONCURRENCY", "4"))
+MAKE_HOOK_TIMEOUT = float(os.getenv("MAKE_HOOK_TIMEOUT", "15"))
+MAKE_HOOK_BATCH = os.getenv("MAKE_HOOK_BATCH", "false").lower() == "true"
+
+# Chrome 재시작 기준: 최대 사용 시간(초), 최대 메모리(MB)
+DRIVER_MAX_AGE = int(os.getenv("DRIVER_MAX_AGE", str(6 * 60 * 60)))
+DRIVER_MAX_RSS_MB = int(os.getenv("DRIVER_MAX_RSS_MB", "1024"))
+# Chrome 프로필 디렉토리 / 원격 디버깅 포트 (0이면 열지 않음). 브라우저를 여러 개 띄우면 각각 달라야 한다
+CHROME_USER_DATA_DIR = os.getenv("CHROME_USER_DATA_DIR", "/home/chrome/chrome-data")
+CHROME_DEBUGGING_PORT = int(os.getenv("CHROME_DEBUGGING_PORT", "9222"))
+# Cafe24 세션 쿠키 저장 위치
+CAFE24_COOKIE_FILE = os.getenv("CAFE24_COOKIE_FILE", "/home/chrome/chrome-data/cafe24_cookies.json")
+
+# Cafe24 로그인/배송중 목록/배송완료 처리 방식: 'selenium' (Chrome) / 'http' (브라우저 없이 HTTP 요청)
+CAFE24_ENGINE = os.getenv("CAFE24_ENGINE", "selenium").lower()
+
+# 배송중 목록 한 페이지에 표시할 주문 수
+SHIPPING_PAGE_LIMIT = int(os.getenv("SHIPPING_PAGE_LIMIT", "500"))
+# 페이지가 가득 차면 페이지 크기를 두 배씩 늘려 다시 읽는다. 이 값까지만 늘린다
+SHIPPING_PAGE_LIMIT_MAX = int(os.getenv("SHIPPING_PAGE_LIMIT_MAX", "10000"))
+# 배송중 목록 URL에서 페이지 크기를 지정하는 쿼리 파라미터 이름
+SHIPPING_PAGE_LIMIT_PARAM = os.getenv("SHIPPING_PAGE_LIMIT_PARAM", "limit")
+
+# 다중 주문 상태 조회 시 한 번에 보낼 주문 수
+STATUS_CHUNK_SIZE = int(os.getenv("STATUS_CHUNK_SIZE", "100"))
+# 스토어 API 동시 요청 수 / 요청별 타임아웃(초)
+STORE_API_CONCURRENCY = int(os.getenv("STORE_API_CONCURRENCY", "5"))
+STORE_API_TIMEOUT = float(os.getenv("STORE_API_TIMEOUT", "15"))
+# batch_update 한 번에 보낼 최대 셀 수
+SHEET_BATCH_SIZE = int(os.getenv("SHEET_BATCH_SIZE", "500"))
+# market_store_order_list에서 읽을 열: 주문 확인용 키 열 + 수동주문 행에 복사되는 앞쪽 열
+SHIPPING_ORDER_KEY_COLUMNS = ('마켓주문번호', '스토어주문번호', '주문상태')
+MANUAL_ORDER_FIELD_COUNT = 9
+# manual_order_list 중복 판단 키
+MANUAL_ORDER_KEY_COLUMNS = ('마켓주문번호', '스토어주문번호')
+# market_store_order_list를 읽기 시작할 행 (오래된 이력 행 건너뛰기)
+SHIPPING_SHEET_START_ROW = int(os.getenv("SHIPPING_SHEET_START_ROW", "2"))
+# 수동처리가 필요한 스토어 주문 상태
+MANUAL_STATUSES = ('Partial', 'Canceled')
+# Cafe24 주문번호 형식 (예: 20240101-0000001)
+MARKET_ORDER_NUM_PATTERN = re.compile(r'\d{8}-\d{7}')
+
+
+# 서비스 계정으로 인증된 gspread 클라이언트 (여러 몰의 GoogleSheetManager가 공유할 수 있다)
+def authorize_sheets():
+    import gspread
+    from google.oauth2 import service_account
+
+    credentials_info = json.loads(json_str)
+    if 'private_key' in credentials_info:
+        pk = credentials_info['private_key']
+        pk = pk.replace('\\n', '\n')
+        credentials_info['private_key'] = pk
+    log.info("JSON 파싱 성공")
+    credentials = service_account.Credentials.from_service_account_info(
+        credentials_info,
+        scopes=['https://www.googleapis.com/auth/spreadsheets']
+    )
+    return gspread.authorize(credentials)
 
 
 class GoogleSheetManager:
-    def __init__(self):
-        self.gc = None
+    def __init__(self, key=None, gc=None):
+        self.key = key or sheet_key
+        self.gc = gc
         self.doc = None
+        self.headers = {}
         self.initialize_connection()
 
+    @timed('sheets.initialize_connection')
     @backoff.on_exception(
         backoff.expo,
         (TransportError, requests.exceptions.RequestException),
-        max_tries=5
+        max_tries=5,
+        on_backoff=metrics.backoff_handler('sheets.initialize_connection')
     )
     def initialize_connection(self):
         try:
-            credentials_info = json.loads(json_str)
-            if 'private_key' in credentials_info:
-                pk = credentials_info['private_key']
-                pk = pk.replace('\\n', '\n')
-                credentials_info['private_key'] = pk
-            print("JSON 파싱 성공")
-            credentials = service_account.Credentials.from_service_account_info(
-                credentials_info,
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
-            self.gc = gspread.authorize(credentials)
-            self.doc = self.gc.open_by_key(sheet_key)
+            if self.gc is None:
+                self.gc = authorize_sheets()
+            self.doc = self.gc.open_by_key(self.key)
         except Exception as e:
-            print(f"연결 초기화 실패: {e}")
+            log.error(f"연결 초기화 실패: {e}")
             raise
 
+    @timed('sheets.get_worksheet')
     def get_worksheet(self, sheet_name):
         try:
             return self.doc.worksheet(sheet_name)
         except Exception as e:
-            print(f"get_worksheet 실패: {e}")
+            log.warning(f"get_worksheet 실패: {e}")
             self.initialize_connection()  # 연결 재시도
             return self.doc.worksheet(sheet_name)
 
+    @timed('sheets.get_sheet_data')
     @backoff.on_exception(
         backoff.expo,
         (TransportError, requests.exceptions.RequestException),
-        max_tries=5
+        max_tries=5,
+        on_backoff=metrics.backoff_handler('sheets.get_sheet_data')
     )
     def get_sheet_data(self, sheet_name):
+        import pandas as pd
+
         worksheet = self.get_worksheet(sheet_name)
         try:
             header = worksheet.row_values(1)
@@ -92,9 +180,94 @@ class GoogleSheetManager:
             
             return df
         except Exception as e:
-            print(f"시트 데이터 가져오기 실패: {e}")
+            log.error(f"시트 데이터 가져오기 실패: {e}")
+            raise
+
+    @timed('sheets.get_or_add_worksheet')
+    def get_or_add_worksheet(self, sheet_name, header):
+        """워크시트가 없으면 header 행만 있는 새 워크시트를 만든다."""
+        import gspread
+
+        try:
+            return self.doc.worksheet(sheet_name)
+        except gspread.exceptions.WorksheetNotFound:
+            worksheet = self.doc.add_worksheet(sheet_name, rows=1, cols=len(header))
+            worksheet.update([header], 'A1')
+            log.info(f"워크시트 생성: {sheet_name}")
+            return worksheet
+
+    # 여러 행 구간을 batch_update 한 번으로 지운다 (요청 전체가 한꺼번에 적용되거나 실패한다).
+    # 아래쪽 구간부터 지워서 앞 구간의 행 번호가 밀리지 않게 한다.
+    # 재시도하면 이미 지워진 뒤의 행이 지워질 수 있어 backoff를 걸지 않는다.
+    @timed('sheets.delete_row_ranges')
+    def delete_row_ranges(self, sheet_name, row_ranges):
+        worksheet = self.get_worksheet(sheet_name)
+        requests_body = [
+            {'deleteDimension': {'range': {
+                'sheetId': worksheet.id, 'dimension': 'ROWS', 'startIndex': start - 1, 'endIndex': end
+            }}}
+            for start, end in sorted(row_ranges, reverse=True)
+        ]
+        if requests_body:
+            self.doc.batch_update({'requests': requests_body})
+
+    def get_header(self, sheet_name):
+        if sheet_name not in self.headers:
+            self.headers[sheet_name] = self.get_worksheet(sheet_name).row_values(1)
+        return self.headers[sheet_name]
+
+    @timed('sheets.get_sheet_columns')
+    @backoff.on_exception(
+        backoff.expo,
+        (TransportError, requests.exceptions.RequestException),
+        max_tries=5,
+        on_backoff=metrics.backoff_handler('sheets.get_sheet_columns')
+    )
+    def get_sheet_columns(self, sheet_name, columns, start_row=2, end_row=None, category_columns=('주문상태',)):
+        """필요한 열만 한 번의 batch_get으로 읽어 DataFrame을 만든다.
+
+        start_row/end_row로 읽을 행 구간을 제한할 수 있고, DataFrame의 index는 시트 행 번호다.
+        """
+        import pandas as pd
+
+        worksheet = self.get_worksheet(sheet_name)
+        header = self.get_header(sheet_name)
+        try:
+            ranges = []
+            for column in columns:
+                letter = _column_letter(header.index(column) + 1)
+                ranges.append(f"{letter}{start_row}:{letter}{end_row or ''}")
+
+            value_ranges = worksheet.batch_get(ranges, major_dimension='COLUMNS')
+            values = [value_range[0] if value_range else [] for value_range in value_ranges]
+            row_cnt = max((len(column_values) for column_values in values), default=0)
+
+            data = {}
+            for column, column_values in zip(columns, values):
+                column_values = column_values + [''] * (row_cnt - len(column_values))
+                dtype = 'category' if column in category_columns else str
+                data[column] = pd.Series(column_values, dtype=dtype)
+
+            df = pd.DataFrame(data, columns=list(columns))
+            df.index = range(start_row, start_row + row_cnt)
+            return df
+        except Exception as e:
+            log.error(f"시트 열 데이터 가져오기 실패: {e}")
             raise
 
+
+def _column_letter(col):
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(1, col)[:-1]
+
+
+# 배송중 주문 확인과 수동주문 행 생성에 필요한 열만 읽는다
+def get_shipping_order_data(sheet_manager, start_row=SHIPPING_SHEET_START_ROW, end_row=None):
+    header = sheet_manager.get_header('market_store_order_list')
+    required = set(header[:MANUAL_ORDER_FIELD_COUNT]) | set(SHIPPING_ORDER_KEY_COLUMNS)
+    columns = [column for column in dict.fromkeys(header) if column and column in required]
+    return sheet_manager.get_sheet_columns('market_store_order_list', columns, start_row, end_row)
+
 # sheet_manager = GoogleSheetManager()
 # service_worksheets = sheet_manager.get_worksheet('market_service_list')
 # order_worksheets = sheet_manager.get_worksheet('market_store_order_list')
@@ -110,6 +283,7 @@ class StoreAPI:
         self.api_key = api_key
         self.base_url = store_basic_url
 
+    @timed('store_api.create_order')
     def create_order(self, service_id, link, quantity, runs=None, interval=None):
 
         params = {
@@ -121,14 +295,20 @@ class StoreAPI:
         }
 
         try:
+            start = time.perf_counter()
             response = requests.post(self.base_url, data=params)
+            metrics.record_payload(f"store_api.{params['action']}", len(response.content))
+            if run_trace.is_recording():
+                run_trace.record_store_api(params, response.status_code, _response_body(response),
+                                           time.perf_counter() - start)
             response.raise_for_status()  # HTTP 오류 체크
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"주문 생성 중 오류 발생: {e}")
+            log.error(f"주문 생성 중 오류 발생: {e}")
             raise
     
     # 주문 상태 확인
+    @timed('store_api.get_order_status')
     def get_order_status(self, order_id):
 
         params = {
@@ -138,14 +318,20 @@ class StoreAPI:
         }
 
         try:
+            start = time.perf_counter()
             response = requests.post(self.base_url, data=params)
+            metrics.record_payload(f"store_api.{params['action']}", len(response.content))
+            if run_trace.is_recording():
+                run_trace.record_store_api(params, response.status_code, _response_body(response),
+                                           time.perf_counter() - start)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"주문 상태 확인 중 오류 발생: {e}")
+            log.error(f"주문 상태 확인 중 오류 발생: {e}")
             raise
 
     # 여러 주문의 상태를 한 번에 확인
+    @timed('store_api.get_multiple_order_status')
     def get_multiple_order_status(self, order_ids):
 
         params = {
@@ -155,14 +341,20 @@ class StoreAPI:
         }
 
         try:
+            start = time.perf_counter()
             response = requests.post(self.base_url, data=params)
+            metrics.record_payload(f"store_api.{params['action']}", len(response.content))
+            if run_trace.is_recording():
+                run_trace.record_store_api(params, response.status_code, _response_body(response),
+                                           time.perf_counter() - start)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"다중 주문 상태 확인 중 오류 발생: {e}")
+            log.error(f"다중 주문 상태 확인 중 오류 발생: {e}")
             raise
 
     # 계정 잔액을 확인
+    @timed('store_api.get_balance')
     def get_balance(self):
         params = {
             'key': self.api_key,
@@ -170,13 +362,150 @@ class StoreAPI:
         }
 
         try:
+            start = time.perf_counter()
             response = requests.post(self.base_url, data=params)
+            metrics.record_payload(f"store_api.{params['action']}", len(response.content))
+            if run_trace.is_recording():
+                run_trace.record_store_api(params, response.status_code, _response_body(response),
+                                           time.perf_counter() - start)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"잔액 확인 중 오류 발생: {e}")
+            log.error(f"잔액 확인 중 오류 발생: {e}")
             raise
 
+# 실행 기록용 응답 본문 (JSON이 아니면 문자열 그대로)
+def _response_body(response):
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def _giveup_store_request(e):
+    # 429(요청 제한)와 5xx는 재시도, 그 외 4xx는 즉시 포기
+    if isinstance(e, httpx.HTTPStatusError):
+        status_code = e.response.status_code
+        return status_code != 429 and status_code < 500
+    return False
+
+
+def create_store_client(concurrency=STORE_API_CONCURRENCY, timeout=STORE_API_TIMEOUT):
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout),
+        limits=httpx.Limits(
+            max_connections=concurrency,
+            max_keepalive_connections=concurrency
+        )
+    )
+
+
+class AsyncStoreAPI:
+    """StoreAPI의 비동기 버전. keep-alive 커넥션 풀을 공유하고 동시 요청 수를 제한한다."""
+
+    def __init__(self, api_key, concurrency=STORE_API_CONCURRENCY, timeout=STORE_API_TIMEOUT, client=None):
+        self.api_key = api_key
+        self.base_url = store_basic_url
+        self.rate_limited_count = 0
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # client를 넘기면 여러 몰이 커넥션 풀을 공유하고, 닫는 것은 넘긴 쪽이 책임진다
+        self.owns_client = client is None
+        self.client = client or create_store_client(concurrency, timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.owns_client:
+            await self.client.aclose()
+
+    @backoff.on_exception(
+        backoff.expo,
+        httpx.HTTPError,
+        max_tries=5,
+        giveup=_giveup_store_request,
+        on_backoff=metrics.backoff_handler('store_api.request')
+    )
+    async def _post(self, params):
+        start = time.perf_counter()
+        async with self.semaphore:
+            response = await self.client.post(self.base_url, data={'key': self.api_key, **params})
+        metrics.record_payload(f"store_api.{params['action']}", len(response.content))
+        if run_trace.is_recording():
+            run_trace.record_store_api(params, response.status_code, _response_body(response),
+                                       time.perf_counter() - start)
+        if response.status_code == 429:
+            self.rate_limited_count += 1
+        response.raise_for_status()
+        return response.json()
+
+    @timed('store_api.create_order')
+    async def create_order(self, service_id, link, quantity, runs=None, interval=None):
+        params = {
+            'action': 'add',
+            'service': service_id,
+            'link': link,
+            'quantity': quantity
+        }
+
+        try:
+            return await self._post(params)
+        except httpx.HTTPError as e:
+            log.error(f"주문 생성 중 오류 발생: {e}")
+            raise
+
+    # 주문 상태 확인
+    @timed('store_api.get_order_status')
+    async def get_order_status(self, order_id):
+        params = {
+            'action': 'status',
+            'order': order_id
+        }
+
+        try:
+            return await self._post(params)
+        except httpx.HTTPError as e:
+            log.error(f"주문 상태 확인 중 오류 발생: {e}")
+            raise
+
+    # 여러 주문의 상태를 한 번에 확인
+    @timed('store_api.get_multiple_order_status')
+    async def get_multiple_order_status(self, order_ids):
+        params = {
+            'action': 'status',
+            'orders': ','.join(map(str, order_ids))
+        }
+
+        try:
+            return await self._post(params)
+        except httpx.HTTPError as e:
+            log.error(f"다중 주문 상태 확인 중 오류 발생: {e}")
+            raise
+
+    # 계정 잔액을 확인
+    @timed('store_api.get_balance')
+    async def get_balance(self):
+        params = {
+            'action': 'balance'
+        }
+
+        try:
+            return await self._post(params)
+        except httpx.HTTPError as e:
+            log.error(f"잔액 확인 중 오류 발생: {e}")
+            raise
+
+    # 커넥션 풀을 미리 열어 둔다 (실패해도 본 작업은 계속 진행).
+    # API 호출(action)은 사용량에 잡히므로 HEAD 요청으로 연결(TCP/TLS)만 맺는다. 응답 코드는 보지 않는다
+    async def warm_up(self):
+        try:
+            await self.client.head(self.base_url)
+        except httpx.HTTPError as e:
+            log.warning(f"스토어 API 연결 준비 실패: {e}")
+
 # if not os.path.exists(json_str):
 #     print(f"JSON 키 파일이 존재하지 않습니다: {json_str}")
 
@@ -186,6 +515,8 @@ class StoreAPI:
 # manual_order_sheets = doc.worksheet('manual_order_list')
 
 def get_sheet_data(sheet):
+    import pandas as pd
+
     header = sheet.row_values(1)
     data = sheet.get_all_records()
 
@@ -197,372 +528,1209 @@ def get_sheet_data(sheet):
     
     return df
 
-def process_manual_order(sheet, orders, hook_url, sheet_manager):
+def process_manual_order(sheet, orders, hook_url, sheet_manager, state_store=None):
+    # 이전 실행에서 이미 알림까지 끝난 주문은 다시 처리하지 않는다
+    if state_store:
+        def already_alerted(order):
+            market_order_num, detail = ManualOrderDispatcher.action_key(order)
+            return state_store.has_action(market_order_num, 'alert_sent', detail)
+
+        orders = [order for order in orders if not already_alerted(order)]
+        if not orders:
+            log.info('새로 처리할 수동주문이 없습니다.')
+            return
+
     try:
-        for order in orders:
-            add_manual_order_sheet(sheet, order)
+        add_manual_order_sheets(sheet, orders)
     except Exception as e:
-        print(f"수동필요 주문 시트 추가 처리 중 오류 발생: {str(e)}")
-        traceback.print_exc()
+        log.exception(f"수동필요 주문 시트 추가 처리 중 오류 발생: {str(e)}")
 
     try:
-        for order in orders:
-            alert_manual_orders(hook_url, sheet_manager, orders)
+        alert_manual_orders(hook_url, sheet_manager, orders, state_store=state_store)
     except Exception as e:
-        print(f"수동필요 주문 알림 처리 중 오류 발생: {str(e)}")
-        traceback.print_exc()
+        log.exception(f"수동필요 주문 알림 처리 중 오류 발생: {str(e)}")
+
+def build_manual_order_row(order):
+    row_data = [str(value) for value in order[:MANUAL_ORDER_FIELD_COUNT]] + [
+        "처리필요",
+        f"주문이 {order[-1]} 상태로 처리가 필요합니다.",
+    ]
+
+    if len(row_data) != 11:  # 컬럼 수와 일치하는지 확인
+        raise ValueError(f"Expected 11 columns, got {len(row_data)}")
+    return row_data
+
+# 이미 시트에 있는 (마켓주문번호, 스토어주문번호)는 건너뛰고 새 행만 한 번에 추가
+@timed('sheets.add_manual_order_sheets')
+def add_manual_order_sheets(sheet, orders):
+    values = sheet.get_all_values()
+    header = values[0] if values else []
+    key_cols = [header.index(column) for column in MANUAL_ORDER_KEY_COLUMNS if column in header]
+    if not key_cols:
+        raise ValueError(f"manual_order_list에 키 컬럼이 없습니다: {MANUAL_ORDER_KEY_COLUMNS}")
+
+    def row_key(row):
+        return tuple(row[col] if col < len(row) else '' for col in key_cols)
+
+    existing = {row_key(row) for row in values[1:]}
+    new_rows = []
+    skipped = 0
 
-def add_manual_order_sheet(sheet, order):
-    print('manual_order 입력')
-    print('주문', order), 
+    for order in orders:
+        try:
+            row_data = build_manual_order_row(order)
+        except ValueError as e:
+            log.error(f"시트 추가 중 오류 발생: {str(e)}", extra={'order_id': order[0]})
+            skipped += 1
+            continue
+
+        key = row_key(row_data)
+        if key in existing:
+            skipped += 1
+            continue
+        existing.add(key)
+        new_rows.append(row_data)
+
+    if new_rows:
+        sheet.append_rows(new_rows)
+        if log.isEnabledFor(logging.DEBUG):
+            for row_data in new_rows:
+                log.debug("수동주문 정보가 시트에 추가되었습니다: %s", row_data, extra={'order_id': row_data[0]})
+    log.info(f"수동주문 시트 추가: {len(new_rows)}건 추가, {skipped}건 건너뜀")
+    return len(new_rows), skipped
+
+class ManualOrderDispatcher:
+    """수동처리 주문 웹훅(Make) 알림.
+
+    manual_order_list는 알림 한 번에 한 번만 읽고, 프로세스가 살아있는 동안
+    이미 알린 주문은 다시 보내지 않는다. batch=True면 한 번의 웹훅 호출에
+    여러 주문을 담아 보낸다.
+    """
+
+    def __init__(self, hook_url, batch=MAKE_HOOK_BATCH, concurrency=MAKE_HOOK_CONCURRENCY):
+        self.hook_url = hook_url
+        self.batch = batch
+        self.concurrency = concurrency
+        self.alerted = set()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @staticmethod
+    def alert_key(order):
+        return (str(order[0]), str(order[7]), str(order[-1]))
+
+    # 상태 저장소 기록용 (마켓주문번호, 상세) 키
+    @staticmethod
+    def action_key(order):
+        _, order_service, status = ManualOrderDispatcher.alert_key(order)
+        return normalize_market_order_num(order[0]), f"{order_service}|{status}"
+
+    @staticmethod
+    def build_payload(order):
+        user_info = order[2].split('\n')
+        order_time = order[8].split('\n')[1].replace("(", '').replace(")", '')
+        return {
+            "order_num": order[0],
+            "user_id": user_info[2],
+            "username": user_info[0],
+            "order_time": order_time,
+            "order_service": f"{order[7]} 주문 {order[-1]} 로 수동처리가 필요합니다.",
+        }
 
-    try:
-        row_data = [
-            str(order[0]),
-            str(order[1]),
-            str(order[2]),
-            str(order[3]),
-            str(order[4]),
-            str(order[5]),
-            str(order[6]),
-            str(order[7]),
-            str(order[8]),
-            "처리필요",
-            f"주문이 {order[-1]} 상태로 처리가 필요합니다.",
-        ]
+    # manual_order_list에서 '처리필요' 상태인 마켓주문번호
+    @staticmethod
+    def pending_order_nums(sheet_manager):
+        df = sheet_manager.get_sheet_data('manual_order_list')
+        if df.empty:
+            return set()
+        return set(df.loc[df['처리상태'] == '처리필요', '마켓주문번호'].astype(str))
+
+    @timed('webhook.post')
+    def _post(self, payload):
+        metrics.record_payload('webhook.post', len(json.dumps(payload, ensure_ascii=False).encode('utf-8')))
+        run_trace.record_webhook(payload)
+        try:
+            response = self.session.post(url=self.hook_url, json=payload, timeout=MAKE_HOOK_TIMEOUT)
+        except requests.RequestException as e:
+            # 한 건이 실패해도 나머지 알림과 전송 기록은 계속 진행한다
+            log.error(f"웹훅 전송 실패: {e}")
+            return False
+        log.debug("웹훅 응답 상태 코드: %s", response.status_code)
+        return response.ok
+
+    def dispatch(self, sheet_manager, orders, state_store=None):
+        pending = self.pending_order_nums(sheet_manager)
+        targets = {}
+        action_keys = {}
 
-        if len(row_data) != 11:  # 컬럼 수와 일치하는지 확인
-            raise ValueError(f"Expected 11 columns, got {len(row_data)}")
-        
-        sheet.append_row(row_data)
-        print(f"수동주문 정보가 시트에 추가되었습니다: {row_data}")
-        return order
+        for order in orders:
+            key = self.alert_key(order)
+            action_keys[key] = self.action_key(order)
+            if str(order[0]) not in pending:
+                log.debug("알릴 주문이 아닙니다.", extra={'order_id': order[0]})
+                continue
+            if state_store and state_store.has_action(action_keys[key][0], 'alert_sent', action_keys[key][1]):
+                self.alerted.add(key)
+            if key in self.alerted or key in targets:
+                log.debug("이미 알린 주문입니다: %s", order[0], extra={'order_id': order[0]})
+                continue
+            try:
+                targets[key] = self.build_payload(order)
+            except (AttributeError, IndexError) as e:
+                log.error(f"알림 내용 생성 실패: {order[0]} - {e}", extra={'order_id': order[0]})
+
+        if not targets:
+            log.info('모든 알림 완료')
+            return 0
+
+        # 보낸 알림은 바로 기록해서, 뒤의 전송이 실패해도 다음 실행에서 다시 보내지 않게 한다
+        def record_sent(keys):
+            self.alerted.update(keys)
+            if state_store:
+                for key in keys:
+                    market_order_num, detail = action_keys[key]
+                    state_store.mark_action([market_order_num], 'alert_sent', detail)
+
+        if self.batch:
+            if self._post({"orders": list(targets.values())}):
+                record_sent(list(targets))
+        else:
+            def post(key, context):
+                if context.run(self._post, targets[key]):
+                    record_sent([key])
 
-    
-    except Exception as e:
-        print(f"시트 추가 중 오류 발생: {str(e)}")
-        traceback.print_exc()
+            # 몰별 지표/실행 기록이 전송 스레드에도 이어지도록 현재 컨텍스트를 복사해서 실행
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = [executor.submit(post, key, contextvars.copy_context()) for key in targets]
+            for future in futures:
+                future.result()
 
-def alert_manual_orders(hook_url, sheet_manager, orders):
+        sent = len(self.alerted.intersection(targets))
+        log.info(f"모든 알림 완료: {sent}/{len(targets)}건")
+        return sent
 
-    df = sheet_manager.get_sheet_data('manual_order_list')
 
-    for order in orders:
-        order_num = order[0]
-        user_info = order[2].split('\n')
-        username = user_info[0]
-        user_id = user_info[2]
-        order_time = order[8].split('\n')[1].replace("(", '').replace(")", '')
-        order_service = order[7]
-        status = order[-1]
+# 웹훅 주소(몰)별 알림 전송기. 몰마다 이미 알린 주문 기록을 따로 유지한다
+manual_order_dispatchers = {}
+_dispatchers_lock = threading.Lock()
 
-        filtered_manual = df[
-            (df['처리상태'] == '처리필요') &  
-            (df['마켓주문번호'] == order_num) 
-        ]
 
-        if len(filtered_manual) > 0:
-            payload = {
-                "order_num": order_num,
-                "user_id": user_id,
-                "username": username,
-                "order_time": order_time,
-                "order_service": f"{order_service} 주문 {status} 로 수동처리가 필요합니다.",
-            }
+def alert_manual_orders(hook_url, sheet_manager, orders, dispatcher=None, state_store=None):
+    if dispatcher is None:
+        with _dispatchers_lock:
+            dispatcher = manual_order_dispatchers.get(hook_url)
+            if dispatcher is None:
+                dispatcher = manual_order_dispatchers[hook_url] = ManualOrderDispatcher(hook_url)
+    return dispatcher.dispatch(sheet_manager, orders, state_store=state_store)
+
+# 시트/크롤링 값에서 대표 마켓주문번호를 추출
+def normalize_market_order_num(value):
+    text = str(value).strip()
+    match = MARKET_ORDER_NUM_PATTERN.search(text)
+    if match:
+        return match.group()
+    return text.split('\n')[0].strip()
+
+
+# 배송중 목록에서 읽은 Cafe24 주문번호. 체크박스 선택과 state_store 기록은 모두 이 값을 키로 쓴다
+# (시트의 마켓주문번호 셀은 여러 주문번호가 들어 있을 수 있어 sheet_market_order_num에 따로 둔다)
+def scraped_order_key(order):
+    return order.get('scraped_order_num') or normalize_market_order_num(order.get('market_order_num'))
+
+
+# 여러 줄/접미사가 붙은 시트 값에서 조회 가능한 모든 키를 추출
+def market_order_keys(value):
+    text = str(value)
+    keys = set(MARKET_ORDER_NUM_PATTERN.findall(text))
+    keys.update(line.strip() for line in text.splitlines() if line.strip())
+    return keys
+
+
+class MarketOrderIndex:
+    """마켓주문번호 -> '배송중' 행의 (위치, 스토어주문번호) 인덱스.
+
+    시트를 한 번만 훑어서 만들고, 이후 조회는 dict 조회로 처리한다.
+    위치는 DataFrame/레코드 목록 기준 0부터 시작하는 순번이다.
+    """
+
+    def __init__(self, market_order_nums, statuses, store_order_nums):
+        self.rows = {}
+        for position, (market_order_num, status, store_order_num) in enumerate(
+                zip(market_order_nums, statuses, store_order_nums)):
+            if status != '배송중':
+                continue
+            for key in market_order_keys(market_order_num):
+                self.rows.setdefault(key, []).append((position, store_order_num))
+
+    @classmethod
+    def from_dataframe(cls, df):
+        # 스토어주문번호 열을 읽지 않은 DataFrame이면 None으로 채운다
+        return cls(df['마켓주문번호'], df['주문상태'], df.get('스토어주문번호', [None] * len(df)))
+
+    @classmethod
+    def from_records(cls, records):
+        return cls(
+            (row.get('마켓주문번호', '') for row in records),
+            (row.get('주문상태') for row in records),
+            (row.get('스토어주문번호') for row in records)
+        )
+
+    def lookup(self, market_order_num):
+        return self.rows.get(normalize_market_order_num(market_order_num), [])
+
+    def positions(self, market_order_num):
+        return [position for position, _ in self.lookup(market_order_num)]
 
-            response = requests.post(url=hook_url, json=payload)
-            print("응답 상태 코드:", response.status_code)
-            print("응답 본문:", response.text)
-            print('알람완료')
-        else:
-            print("알릴 주문이 아닙니다.")
-    print('모든 알림 완료')
-    return 
 
 # 1. Selenium WebDriver 설정
-def init_driver():
+@timed('selenium.init_driver')
+def init_driver(lean=CHROME_LEAN_MODE, user_data_dir=CHROME_USER_DATA_DIR, debugging_port=CHROME_DEBUGGING_PORT):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.common.exceptions import WebDriverException
+
     chrome_options = Options()
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--headless')
     chrome_options.add_argument('--disable-dev-shm-usage')
     chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--user-data-dir=/home/chrome/chrome-data')
-    chrome_options.add_argument('--remote-debugging-port=9222') 
+    chrome_options.add_argument(f'--user-data-dir={user_data_dir}')
+    if debugging_port:
+        chrome_options.add_argument(f'--remote-debugging-port={debugging_port}')
+
+    if lean:
+        # DOM만 준비되면 진행 (이미지/광고 스크립트 로딩을 기다리지 않음)
+        chrome_options.page_load_strategy = CHROME_PAGE_LOAD_STRATEGY
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument('--renderer-process-limit=1')
+        chrome_options.add_argument('--disk-cache-size=1')
+        chrome_options.add_argument('--media-cache-size=1')
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--disable-background-networking')
+        chrome_options.add_argument('--disable-features=Translate,MediaRouter,OptimizationHints')
+
     driver = webdriver.Chrome(options=chrome_options)
+
+    if lean:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': CHROME_BLOCKED_URLS})
+        except WebDriverException as e:
+            log.warning(f"리소스 차단 설정 실패: {e}")
     return driver
 
 
 # 2. Cafe24 로그인
-def cafe24_login(driver, login_page, wait):
+@timed('selenium.cafe24_login')
+def cafe24_login(driver, login_page, wait, mall=default_mall):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+
     driver.get(login_page)
     try:
         wait.until(EC.all_of(
             EC.presence_of_element_located((By.NAME, "loginId")),
             EC.presence_of_element_located((By.NAME, "loginPasswd"))
         ))
-        driver.find_element(By.NAME, "loginId").send_keys(username)  # Admin ID 입력
-        driver.find_element(By.NAME, "loginPasswd").send_keys(password)  # 비밀번호 입력
+        driver.find_element(By.NAME, "loginId").send_keys(mall.username)  # Admin ID 입력
+        driver.find_element(By.NAME, "loginPasswd").send_keys(mall.password)  # 비밀번호 입력
         try:
             login_btn = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "button.btnStrong.large")))
             driver.execute_script("arguments[0].click();", login_btn)
             pw_change_btn = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#iptBtnEm")))
             driver.execute_script("arguments[0].click();", pw_change_btn)
-            wait.until(EC.url_to_be(dashboard_page))
+            wait.until(EC.url_to_be(mall.dashboard_page))
         except Exception as e:
-            print(f"클릭 중 오류 발생: {e}")
+            log.error(f"클릭 중 오류 발생: {e}")
     except TimeoutException:
-        print("20초 동안 버튼이 클릭 가능한 상태가 되지 않았습니다.")
+        log.warning("20초 동안 버튼이 클릭 가능한 상태가 되지 않았습니다.")
     return driver
 
 
+# /proc 기준 root_pid와 하위 프로세스의 RSS 합계(MB), 확인할 수 없으면 None
+def _process_tree_rss_mb(root_pid):
+    if not os.path.isdir('/proc'):
+        return None
+
+    children = {}
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(pid))
+
+    total_kb = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+class DriverManager:
+    """스케줄러 실행 사이에 유지되는 Chrome 세션.
+
+    Cafe24 세션 쿠키를 파일로 보관해 브라우저를 다시 띄워도 재사용하고,
+    세션이 만료됐을 때만 다시 로그인한다. 브라우저가 응답하지 않거나
+    max_age(초) / max_rss_mb(MB)를 넘으면 새로 띄운다.
+    """
+
+    def __init__(self, max_age=DRIVER_MAX_AGE, max_rss_mb=DRIVER_MAX_RSS_MB, cookie_file=CAFE24_COOKIE_FILE,
+                 user_data_dir=CHROME_USER_DATA_DIR, debugging_port=CHROME_DEBUGGING_PORT):
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+        self.cookie_file = cookie_file
+        self.user_data_dir = user_data_dir
+        self.debugging_port = debugging_port
+        self.driver = None
+        self.wait = None
+        self.started_at = None
+        # 현재 브라우저 세션이 로그인된 몰
+        self.mall = None
+
+    def get_driver(self):
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        if self.driver and self._needs_restart():
+            self.quit()
+        if self.driver is None:
+            self.driver = init_driver(user_data_dir=self.user_data_dir, debugging_port=self.debugging_port)
+            self.wait = WebDriverWait(self.driver, timeout=20)
+            self.started_at = time.monotonic()
+            log.info('Chrome 시작')
+        return self.driver
+
+    def _needs_restart(self):
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            self.driver.current_url
+        except WebDriverException as e:
+            log.warning(f"Chrome 응답 없음, 재시작합니다: {e}")
+            return True
+
+        age = time.monotonic() - self.started_at
+        if age > self.max_age:
+            log.warning(f"Chrome 사용 시간 초과({age:.0f}초), 재시작합니다.")
+            return True
+
+        rss_mb = _process_tree_rss_mb(self.driver.service.process.pid)
+        if rss_mb is not None and rss_mb > self.max_rss_mb:
+            log.warning(f"Chrome 메모리 초과({rss_mb:.0f}MB), 재시작합니다.")
+            return True
+        return False
+
+    def is_logged_in(self, mall=default_mall):
+        from selenium.webdriver.common.by import By
+
+        self.driver.get(mall.dashboard_page)
+        # 세션이 만료되면 로그인 페이지로 이동한다
+        return not self.driver.find_elements(By.NAME, "loginId")
+
+    def load_cookies(self, login_page, cookie_file=None):
+        from selenium.common.exceptions import WebDriverException
+
+        cookie_file = cookie_file or self.cookie_file
+        if not os.path.exists(cookie_file):
+            return False
+        try:
+            with open(cookie_file, encoding='utf-8') as f:
+                cookies = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"쿠키 파일 읽기 실패: {e}")
+            return False
+
+        now = time.time()
+        # 쿠키는 같은 도메인 페이지를 연 상태에서만 추가할 수 있다
+        self.driver.get(login_page)
+        for cookie in cookies:
+            if cookie.get('expiry') and cookie['expiry'] < now:
+                continue
+            try:
+                self.driver.add_cookie(cookie)
+            except WebDriverException:
+                continue
+        return True
+
+    def save_cookies(self, cookie_file=None):
+        try:
+            with open(cookie_file or self.cookie_file, 'w', encoding='utf-8') as f:
+                json.dump(self.driver.get_cookies(), f)
+        except OSError as e:
+            log.warning(f"쿠키 파일 저장 실패: {e}")
+
+    def ensure_login(self, login_page, mall=default_mall):
+        driver = self.get_driver()
+        cookie_file = mall.path_for(self.cookie_file)
+        if self.mall is not None and self.mall.name != mall.name:
+            # 다른 몰 세션이 남아있으면 지우고 해당 몰 쿠키로 복원하거나 다시 로그인
+            log.info(f'Cafe24 세션 전환: {self.mall} -> {mall}')
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            self.mall = None
+        elif self.is_logged_in(mall):
+            log.info('기존 Cafe24 세션 사용')
+            self.mall = mall
+            return driver
+        if self.load_cookies(login_page, cookie_file) and self.is_logged_in(mall):
+            log.info('저장된 Cafe24 쿠키로 세션 복원')
+            self.mall = mall
+            return driver
+
+        cafe24_login(driver, login_page, self.wait, mall)
+        self.save_cookies(cookie_file)
+        self.mall = mall
+        return driver
+
+    def quit(self):
+        if self.driver is None:
+            return
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            self.driver.quit()
+        except WebDriverException as e:
+            log.warning(f"Chrome 종료 실패: {e}")
+        self.driver = None
+        self.wait = None
+        self.mall = None
+
+
+# 배송중 목록 테이블을 한 번의 스크립트 실행으로 읽는다
+SCRAPE_ORDERS_SCRIPT = """
+var rows = [];
+document.querySelectorAll('#searchResultList tbody.center').forEach(function (tbody) {
+    var orderNum = tbody.querySelector('td.orderNum');
+    if (!orderNum) {
+        return;
+    }
+    var chk = tbody.querySelector('.chkbox');
+    rows.push({
+        order_num_text: orderNum.innerText,
+        checkbox_id: chk ? (chk.value || chk.id || '') : '',
+        check_element: chk
+    });
+});
+return rows;
+"""
+
+
+# 한 페이지에 모든 배송중 주문이 나오도록 목록 URL에 페이지 크기를 지정
+def with_page_limit(page_url, limit=SHIPPING_PAGE_LIMIT, param=SHIPPING_PAGE_LIMIT_PARAM):
+    # orderStatus[]=N30&orderStatus[]=N40처럼 반복되는 필터가 있으므로 (키, 값) 목록으로 다루고 페이지 크기만 바꾼다
+    parts = urlsplit(page_url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != param]
+    query.append((param, str(limit)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def read_all_pages(fetch, limit=SHIPPING_PAGE_LIMIT, max_limit=SHIPPING_PAGE_LIMIT_MAX):
+    """fetch(limit)로 배송중 목록 행을 읽는다 (읽지 못하면 None).
+
+    한 페이지가 가득 차면 뒤에 주문이 더 있을 수 있으므로, 페이지 크기보다 적은 행이 돌아올 때까지
+    페이지 크기를 두 배로 늘려 다시 읽는다. 최대 크기까지 채우면 읽지 못한 주문이 있다고 에러를 남긴다.
+
+    늘린 페이지에서도 행 수가 그대로면 주문 수가 마침 페이지 크기와 같거나, 목록이 페이지 크기
+    파라미터를 무시한 것이다. 더 작은 페이지를 한 번 요청해 보고 행 수가 줄지 않으면 경고를 남긴다.
+    """
+    rows = fetch(limit)
+    while rows is not None and len(rows) >= limit:
+        if limit * 2 > max_limit:
+            log.error(f"⚠️ 배송중 주문이 최대 페이지 크기({limit})를 채웠습니다. 그 뒤의 주문은 읽지 못했습니다. "
+                      f"SHIPPING_PAGE_LIMIT_MAX를 늘리세요.")
+            break
+        full_page = len(rows)
+        limit *= 2
+        log.info(f"배송중 주문이 페이지를 채워 페이지 크기 {limit}로 다시 읽습니다.")
+        rows = fetch(limit)
+        if rows is not None and len(rows) == full_page:
+            probe = fetch(max(full_page // 2, 1))
+            if probe is not None and len(probe) >= full_page:
+                log.warning(
+                    f"⚠️ 배송중 목록이 페이지 크기 파라미터({SHIPPING_PAGE_LIMIT_PARAM})를 무시합니다. "
+                    f"첫 페이지의 {full_page}건만 읽었고 전체 주문 수는 알 수 없습니다. "
+                    f"SHIPPING_PAGE_LIMIT_PARAM을 확인하세요."
+                )
+            # 작은 페이지로 이동했으므로 (Selenium은 요소 참조도) 다시 읽는다
+            rows = fetch(limit)
+            break
+    return rows
+
+
 # 3. 배송중 주문 정보 크롤링
+@timed('selenium.scrape_orders')
 def scrape_orders(driver, shipping_order_page, wait):
-    driver.get(shipping_order_page)
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+
+    def fetch(limit):
+        driver.get(with_page_limit(shipping_order_page, limit))
+        try:
+            # 주문이 있으면 td.orderNum, 없으면 '검색된 주문내역이 없습니다.' tbody.empty 가 나타난다
+            wait.until(EC.any_of(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "#searchResultList td.orderNum")),
+                EC.presence_of_element_located((By.CSS_SELECTOR, "#searchResultList tbody.empty")),
+            ))
+        except TimeoutException:
+            log.warning("20초 동안 어떤 조건도 만족하지 않았습니다.")
+            return None
+        return driver.execute_script(SCRAPE_ORDERS_SCRIPT)
 
     # 주문 정보 크롤링
-    orders = []
     order_list = []
 
-    try:
-        wait.until(EC.all_of(
-            # 검색된 주문내역이 없습니다.
-            # tbody class empty
-            # td colspan = 9 검색된 주문내역이 없습니다.
-            # 모든 조건을 만족하는 요소를 찾는다
-            EC.presence_of_element_located((By.CSS_SELECTOR, "td.orderNum")),
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".chkbox")),
-        ))
-    except TimeoutException:
-        print("20초 동안 어떤 조건도 만족하지 않았습니다.")
+    rows = read_all_pages(fetch)
+    if rows is None:
+        return [[], '']
+    log.info(f"주문수량: {len(rows)}")
+
+    if len(rows) == 0:
+        log.info('검색된 주문내역이 없습니다.')
         return [[], '']
 
-    order_element = driver.find_element(By.CSS_SELECTOR, "#searchResultList")
-    orders = order_element.find_elements(By.CSS_SELECTOR, "tbody.center")
     eshipEnd_element = driver.find_element(By.CSS_SELECTOR, "#eShippedEndBtn")
-    print('주문수량', len(orders))
 
-    if len(orders) > 0:
-        for order in orders:
-            try:
-                order_num_element = order.find_element(By.CSS_SELECTOR, "td.orderNum")
-            except NoSuchElementException:
-                continue
-            try:
-                order_chk = order.find_element(By.CSS_SELECTOR, ".chkbox")
-            except NoSuchElementException:
-                print('no chkbox')
+    for row in rows:
+        lines = row['order_num_text'].split('\n')
+        if len(lines) < 2:
+            continue
+        if not row['check_element']:
+            log.debug('no chkbox', extra={'order_id': lines[1].split(' ')[0]})
+
+        market_order_num = lines[1].split(' ')[0]
+        order_list.append({
+            "market_order_num": market_order_num,
+            "scraped_order_num": normalize_market_order_num(market_order_num),
+            "checkbox_id": row['checkbox_id'],
+            "check_element": row['check_element'],
+        })
+
+    log.info('배송중 주문목록 작성완료')
+    return [order_list, eshipEnd_element]
 
-            order_num_text = order_num_element.text
-            order_num = order_num_text.split('\n')[1].split(' ')[0]
 
-            order_list.append({
-                "market_order_num": order_num,
-                "check_element": order_chk,
-            })
-    else:
-        print('검색된 주문내역이 없습니다.')
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
-    print('배송중 주문목록 작성완료')
-    return [order_list, eshipEnd_element]
 
+async def _get_chunk_status(store_api, chunk):
+    if asyncio.iscoroutinefunction(store_api.get_multiple_order_status):
+        return await store_api.get_multiple_order_status(chunk)
+    # 동기 StoreAPI는 이벤트 루프를 막지 않도록 스레드에서 실행
+    return await asyncio.to_thread(store_api.get_multiple_order_status, chunk)
+
+
+# 스토어주문번호 목록의 상태를 chunk_size 개씩 묶어서 동시에 조회
+async def fetch_order_statuses(store_api, order_ids, chunk_size=STATUS_CHUNK_SIZE):
+    statuses = {}
+    unique_ids = list(dict.fromkeys(str(order_id) for order_id in order_ids))
+    chunks = list(chunked(unique_ids, chunk_size))
+
+    responses = await asyncio.gather(
+        *(_get_chunk_status(store_api, chunk) for chunk in chunks),
+        return_exceptions=True
+    )
 
-async def check_order(orders, shipping_orders, store_api):
+    for chunk, response in zip(chunks, responses):
+        if isinstance(response, Exception):
+            # 해당 묶음의 주문은 상태를 알 수 없으므로 미완료로 취급
+            for order_id in chunk:
+                statuses[order_id] = {'error': str(response)}
+            continue
+
+        for order_id in chunk:
+            result = response.get(order_id) if isinstance(response, dict) else None
+            if not isinstance(result, dict):
+                result = {'error': '응답에 주문 정보가 없습니다.'}
+            if 'error' in result:
+                log.warning(f"주문 상태 확인 실패: {order_id} - {result['error']}", extra={'order_id': order_id})
+            statuses[order_id] = result
+
+    log.info(f"주문 상태 조회: {len(unique_ids)}건 / API 호출 {len(chunks)}회")
+    return statuses
+
+
+async def check_order(orders, shipping_orders, store_api, chunk_size=STATUS_CHUNK_SIZE, status_cache=None, state_store=None, stats=None):
     processed_orders = []
+    near_complete_cnt = 0
     manual_process_orders = []
-    for order in orders:
+    matched_orders = []
+    order_index = MarketOrderIndex.from_dataframe(shipping_orders)
+
+    # 새로 생겼거나 다시 확인할 시점이 된 주문만 확인
+    orders_to_check = orders
+    if state_store:
+        order_nums = [scraped_order_key(order) for order in orders]
+        state_store.record_scraped(order_nums)
+        # 이전 실행에서 시트는 배송완료로 바꿨지만 배송완료 버튼 처리가 끝나지 않은 주문은
+        # 시트에서 더 이상 '배송중'으로 찾을 수 없으므로 확인 없이 바로 배송완료 처리 대상으로 넘긴다
+        eship_pending = state_store.with_pending_action(order_nums, 'sheet_marked', 'eship_clicked')
+        processed_orders = [order for order, num in zip(orders, order_nums) if num in eship_pending]
+        if processed_orders:
+            log.info(f"배송완료 처리가 남은 주문 {len(processed_orders)}건은 시트 확인 없이 다시 처리")
+        due = state_store.due_orders(order_nums)
+        run_trace.record_state('due', due)
+        run_trace.record_state('eship_pending', eship_pending)
+        orders_to_check = [
+            order for order, num in zip(orders, order_nums) if num in due and num not in eship_pending
+        ]
+        log.info(f"확인 시점이 아닌 주문 {len(orders) - len(orders_to_check) - len(processed_orders)}건 건너뜀")
+
+    # 1. 크롤링한 주문별로 시트의 '배송중' 행을 먼저 모두 찾는다
+    for order in orders_to_check:
+        market_order_num = order.get('market_order_num')
+        filtered_orders = shipping_orders.iloc[order_index.positions(market_order_num)]
+
+        # ⚠️ Google Sheets에 '배송중' 상태의 주문이 없는 경우 경고
+        if len(filtered_orders) == 0:
+            log.warning(
+                f"⚠️ [경고] Google Sheets에서 '배송중' 상태의 주문을 찾을 수 없음: {market_order_num} "
+                f"→ API 상태 확인 없이 건너뜀 (배송완료 처리하지 않음)",
+                extra={'order_id': market_order_num}
+            )
+            if state_store:
+                state_store.schedule_recheck(scraped_order_key(order))
+            continue
+
+        matched_orders.append((order, filtered_orders))
+
+    # 2. 스토어주문번호를 모아서 묶음 단위로 상태 조회
+    store_order_nums = [
+        store_order_num
+        for _, filtered_orders in matched_orders
+        for store_order_num in filtered_orders['스토어주문번호']
+    ]
+    # 캐시에 있는 종료 상태/최근 조회 상태는 API를 다시 호출하지 않는다
+    cached_statuses = status_cache.get_fresh(store_order_nums) if status_cache else {}
+    statuses = await fetch_order_statuses(
+        store_api,
+        [num for num in store_order_nums if str(num) not in cached_statuses],
+        chunk_size
+    )
+    if status_cache:
+        status_cache.put(statuses)
+        log.info(f"캐시된 주문 상태 사용: {len(cached_statuses)}건")
+    statuses.update(cached_statuses)
+    run_trace.record_statuses(statuses)
+
+    # 3. 마켓주문별 완료 여부 판단
+    for order, filtered_orders in matched_orders:
         try:
-            market_order_num = order.get('market_order_num')
-            filtered_orders = shipping_orders[
-                (shipping_orders['마켓주문번호'].str.contains(market_order_num, na=False)) &
-                (shipping_orders['주문상태'] == '배송중')
-            ]
-            is_all_complete = False
             order_cnt = len(filtered_orders)
+            complete_cnt = 0
 
-            # ⚠️ Google Sheets에 '배송중' 상태의 주문이 없는 경우 경고
-            if order_cnt == 0:
-                print()
-                print(f"⚠️ [경고] Google Sheets에서 '배송중' 상태의 주문을 찾을 수 없음")
-                print(f"   마켓주문번호: {market_order_num}")
-                print(f"   → API 상태 확인 없이 건너뜀 (배송완료 처리하지 않음)")
-                print()
-                continue
-
+            # 시트 셀 값은 따로 둔다. market_order_num/scraped_order_num은 크롤링한 값 그대로 유지
             if order_cnt == 1:
-                complete_cnt = 0
-                store_order_num = filtered_orders.iloc[0]['스토어주문번호']
-                market_order_sheet_num = filtered_orders.iloc[0]['마켓주문번호']
-                response = store_api.get_order_status(store_order_num)
-                order["market_order_num"] = market_order_sheet_num
-                if response.get('status') == 'Completed':
+                order['sheet_market_order_num'] = filtered_orders.iloc[0]['마켓주문번호']
+
+            for i in range(order_cnt):
+                row = filtered_orders.iloc[i]
+                store_order_num = row['스토어주문번호']
+                market_order_sheet_num = row['마켓주문번호']
+                status = statuses.get(str(store_order_num), {}).get('status')
+
+                if status == 'Completed':
                     complete_cnt += 1
-                    print()
-                    print('완료된 주문')
-                    print(f"{store_order_num} - {market_order_sheet_num}", response.get("status"))
-                    print()
-                elif response.get('status') == 'Partial' or response.get('status') == 'Canceled':
-                    manual_order = shipping_orders[shipping_orders['마켓주문번호'] == order['market_order_num']]
+                    label = '완료된 주문'
+                elif status in MANUAL_STATUSES:
+                    manual_order = row.tolist()
+                    manual_order.append(status)
                     manual_process_orders.append(manual_order)
-                    print()
-                    print('수동처리가 필요한 주문')
-                    print(f"{store_order_num} - {market_order_sheet_num}", response.get("status"))
-                    print()
+                    label = '수동처리가 필요한 주문'
                 else:
-                    print()
-                    print('완료되지 않은 주문')
-                    print(f"{store_order_num} - {market_order_sheet_num}", response.get("status"))
-                    print()
-            else:
-                complete_cnt = 0
-                for i in range(order_cnt):
-                    store_order_num = filtered_orders.iloc[i]['스토어주문번호']
-                    market_order_sheet_num = filtered_orders.iloc[i]['마켓주문번호']
-                    response = store_api.get_order_status(store_order_num)
-                    # order["market_order_num"] = market_order_sheet_num
-                    if response.get('status') == 'Completed':
-                        complete_cnt += 1
-                        print()
-                        print('완료된 주문')
-                        print(f"{store_order_num} - {market_order_sheet_num}", response.get("status"))
-                        print()
-                    elif response.get('status') == 'Partial' or response.get('status') == 'Canceled':
-                        df_manual_order = shipping_orders[shipping_orders['마켓주문번호'] == market_order_sheet_num]
-                        manual_order = df_manual_order.values.tolist()[0]
-                        manual_order.append(response.get('status'))
-                        print('manual_order', manual_order)
-                        manual_process_orders.append(manual_order)
-                        print()
-                        print('수동처리가 필요한 주문')
-                        print(f"{store_order_num} - {market_order_sheet_num}", response.get("status"))
-                        print()
-                    else:
-                        print()
-                        print('완료되지 않은 주문')
-                        print(f"{store_order_num} - {market_order_sheet_num}", response.get("status"))
-                        print()
-
-            # 🔒 버그 수정: order_cnt가 0인 경우 배송완료 처리 방지
-            if order_cnt > 0 and complete_cnt == order_cnt:
-                is_all_complete = True
-
-            if is_all_complete:
+                    label = '완료되지 않은 주문'
+                # 주문별 상세는 DEBUG에서만 남긴다 (대량 실행 시 로그 I/O 절약)
+                log.debug("%s: %s - %s %s", label, store_order_num, market_order_sheet_num, status,
+                          extra={'order_id': market_order_sheet_num})
+
+            if complete_cnt == order_cnt:
                 processed_orders.append(order)
-                
+            elif complete_cnt > 0:
+                # 일부 스토어주문만 완료된 마켓주문
+                near_complete_cnt += 1
+
+            if state_store:
+                order_key = scraped_order_key(order)
+                state_store.link_store_orders(order_key, filtered_orders['스토어주문번호'])
+                if complete_cnt != order_cnt:
+                    state_store.schedule_recheck(
+                        order_key, NEAR_COMPLETE_RECHECK_INTERVAL if complete_cnt > 0 else None)
+
         except Exception as e:
-            print(f"주문 처리 중 오류 발생: url, 에러: {e}")
-            traceback.print_exc()
-        # print(order)
-    print('-------------------------------')
-    print(f"진행중인 전체 주문 수: {len(orders)}")
-    print(f"완료된 주문 수: {len(processed_orders)}")
-    print(f"수동처리 필요한 주문 수: {len(manual_process_orders)}")
-    print('-------------------------------')
+            log.exception(f"주문 처리 중 오류 발생: {order.get('market_order_num')}, 에러: {e}",
+                          extra={'order_id': order.get('market_order_num')})
+
+    log.info(
+        f"진행중인 전체 주문 수: {len(orders)}, 완료된 주문 수: {len(processed_orders)}, "
+        f"수동처리 필요한 주문 수: {len(manual_process_orders)}"
+    )
+    if stats is not None:
+        stats.update({
+            'scraped': len(orders),
+            'checked': len(matched_orders),
+            'processed': len(processed_orders),
+            'manual': len(manual_process_orders),
+            'near_complete': near_complete_cnt,
+        })
     return [processed_orders, manual_process_orders]
 
-def process_orders(shipping_order_sheets, orders):
-    try:
-        cell = shipping_order_sheets.find('주문상태')
-        status_col = cell.col
-        
-        cnt = 0
-        result = [False, orders]
-        
-        for order in orders:
-            data = shipping_order_sheets.get_all_records()  # 매 주문마다 최신 데이터 조회
-            market_order_num = order.get('market_order_num')
-            
-            # 한 번에 하나의 행만 업데이트
-            for idx, row in enumerate(data):
-                if (row['주문상태'] == '배송중' and 
-                    market_order_num in row['마켓주문번호']):
-                    row_num = idx + 2
-                    
-                    try:
-                        # batch_update 대신 개별 업데이트
-                        shipping_order_sheets.update_cell(row_num, status_col, '배송완료')
-                        print(f"{market_order_num} - {row_num}행 배송완료로 변경 성공")
-                        cnt += 1
-                        time.sleep(0.5)  # API 요청 제한 고려
-                    except Exception as e:
-                        print(f"{row_num}행 업데이트 실패: {e}")
-                        continue
-            
-            order["check_element"].click()
-            time.sleep(1)
+# 스냅샷 이후 다른 값으로 바뀐 행은 덮어쓰지 않도록 대상 행을 한 번에 다시 확인
+@timed('sheets.recheck_target_rows')
+def recheck_target_rows(shipping_order_sheets, targets, market_col, status_col):
+    from gspread.utils import rowcol_to_a1
+
+    if not targets:
+        return targets
+
+    first_row, last_row = min(targets), max(targets)
+    ranges = [
+        f"{rowcol_to_a1(first_row, col)}:{rowcol_to_a1(last_row, col)}"
+        for col in (market_col, status_col)
+    ]
+    market_values, status_values = shipping_order_sheets.batch_get(ranges)
+
+    def cell(values, row_num):
+        offset = row_num - first_row
+        if offset < len(values) and values[offset]:
+            return str(values[offset][0])
+        return ''
+
+    confirmed = {}
+    for row_num, market_order_cell in targets.items():
+        if (cell(status_values, row_num) == '배송중' and
+                cell(market_values, row_num) == market_order_cell):
+            confirmed[row_num] = market_order_cell
+        else:
+            log.info(f"{row_num}행이 조회 이후 변경되어 업데이트하지 않습니다.", extra={'order_id': market_order_cell})
+    return confirmed
+
 
-        if cnt > 0:
+@timed('sheets.process_orders')
+def process_orders(sheet_manager, orders, state_store=None, lock_path=SHEET_LOCK_PATH):
+    from gspread.utils import rowcol_to_a1
+
+    result = [False, orders]
+    shipping_order_sheets = sheet_manager.get_worksheet('market_store_order_list')
+    try:
+        # 이전 실행에서 시트 표시까지 끝난 주문은 배송완료 버튼 처리만 남아 있다
+        order_keys = {id(order): scraped_order_key(order) for order in orders}
+        already_marked = set()
+        if state_store:
+            already_marked = state_store.with_action(order_keys.values(), 'sheet_marked')
+            run_trace.record_state('sheet_marked', already_marked)
+
+        # 조회한 행 번호로 쓰는 동안 보관 이동(archiver)이 행을 지우지 않도록 잠근다
+        with sheet_lock(lock_path):
+            # 시트는 한 번만 조회하고, 배송완료 표시에 필요한 두 열만 읽는다 (index는 시트 행 번호)
+            df = sheet_manager.get_sheet_columns('market_store_order_list', ['마켓주문번호', '주문상태'])
+            header = sheet_manager.get_header('market_store_order_list')
+            status_col = header.index('주문상태') + 1
+            market_col = header.index('마켓주문번호') + 1
+            order_index = MarketOrderIndex.from_dataframe(df)
+
+            # 배송완료로 바꿀 행 번호 -> 스냅샷의 마켓주문번호
+            targets = {}
+            target_orders = {}
+            for order in orders:
+                if order_keys[id(order)] in already_marked:
+                    continue
+                for position in order_index.positions(order_keys[id(order)]):
+                    row_num = df.index[position]
+                    targets[row_num] = df['마켓주문번호'].iat[position]
+                    target_orders[row_num] = order_keys[id(order)]
+
+            targets = recheck_target_rows(shipping_order_sheets, targets, market_col, status_col)
+
+            cnt = 0
+            for row_nums in chunked(sorted(targets), SHEET_BATCH_SIZE):
+                try:
+                    shipping_order_sheets.batch_update([
+                        {'range': rowcol_to_a1(row_num, status_col), 'values': [['배송완료']]}
+                        for row_num in row_nums
+                    ])
+                    if log.isEnabledFor(logging.DEBUG):
+                        for row_num in row_nums:
+                            log.debug("%s - %s행 배송완료로 변경 성공", targets[row_num], row_num,
+                                      extra={'order_id': targets[row_num]})
+                    cnt += len(row_nums)
+                    if state_store:
+                        state_store.mark_action({target_orders[row_num] for row_num in row_nums}, 'sheet_marked')
+                except Exception as e:
+                    log.error(f"{row_nums[0]}~{row_nums[-1]}행 업데이트 실패: {e}")
+                    continue
+
+        log.info(f"시트 배송완료 변경: {cnt}행")
+        if cnt > 0 or already_marked:
             result = [True, orders]
         return result
 
     except Exception as e:
-        print(f"오류 발생: {e}")
-        traceback.print_exc()
+        log.exception(f"오류 발생: {e}")
         return result
 
+# 마켓주문번호 목록에 해당하는 행만 체크되도록 한 번에 맞추고, 실제로 체크된 행의 주문번호를 돌려준다.
+# 주문번호 추출은 scrape_orders/normalize_market_order_num과 같은 규칙을 따른다.
+SELECT_ORDERS_SCRIPT = r"""
+var targets = new Set(arguments[0]);
+var pattern = /\d{8}-\d{7}/;
+var selected = [];
+document.querySelectorAll('#searchResultList tbody.center').forEach(function (tbody) {
+    var orderNum = tbody.querySelector('td.orderNum');
+    var chk = tbody.querySelector('.chkbox');
+    if (!orderNum || !chk) {
+        return;
+    }
+    var lines = orderNum.innerText.split('\n');
+    var num = lines.length > 1 ? lines[1].split(' ')[0] : '';
+    var match = num.match(pattern);
+    var key = match ? match[0] : num.trim();
+    var wanted = key !== '' && targets.has(key);
+    // 페이지의 선택 처리 이벤트가 실행되도록 click()으로 상태를 바꾼다
+    if (chk.checked !== wanted) {
+        chk.click();
+    }
+    if (chk.checked) {
+        selected.push(key);
+    }
+});
+return selected;
+"""
+
+
+@timed('selenium.select_order_checkboxes')
+def select_order_checkboxes(driver, orders, wait=None):
+    """배송중 목록에서 orders의 체크박스를 한 번의 스크립트로 선택하고, 선택된 마켓주문번호 집합을 돌려준다.
+
+    의도하지 않은 주문이 선택되어 있으면 배송완료 버튼을 누르지 않도록 예외를 낸다.
+    목록에서 사라진 주문(이미 처리됨 등)은 경고만 남기고 제외한다.
+    """
+    targets = {scraped_order_key(order) for order in orders}
+    selected = set(driver.execute_script(SELECT_ORDERS_SCRIPT, sorted(targets)))
+
+    unexpected = selected - targets
+    if unexpected:
+        raise RuntimeError(f"의도하지 않은 주문이 선택되었습니다: {sorted(unexpected)}")
+    missing = targets - selected
+    if missing:
+        log.warning(f"배송중 목록에서 찾을 수 없어 선택하지 못한 주문 {len(missing)}건: {sorted(missing)}")
+    log.info(f"배송완료 처리할 주문 선택: {len(selected)}/{len(targets)}건")
+    return selected
+
+
+@timed('selenium.process_eship')
 def process_eship(driver, orders, order_element, alert, wait):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
     if orders[0]:
-        driver.execute_script("arguments[0].click();", order_element)
-        alert = wait.until(EC.alert_is_present())
-        alert.accept()
-        alert = wait.until(EC.alert_is_present())
-        alert.accept()
+        # 페이지가 다시 그려졌을 수 있으므로 버튼은 누를 때 다시 찾는다
+        button = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#eShippedEndBtn")))
+        driver.execute_script("arguments[0].click();", button)
+        # 확인 창 → 완료 알림 순서로 뜨는 두 alert를 차례로 기다려 닫는다
+        wait.until(EC.alert_is_present()).accept()
+        wait.until(EC.alert_is_present()).accept()
+        wait.until(lambda d: not EC.alert_is_present()(d))
     return
 
-async def main(logger=None, send_alert=None):
+_profiled = False
+
+
+# open_browser/scrape_orders/refresh_order_elements/select_order_checkboxes/process_eship을 제공하는 모듈
+def load_cafe24_engine(name=CAFE24_ENGINE):
+    if name == 'http':
+        import cafe24_http
+        return cafe24_http
+    if name != 'selenium':
+        raise ValueError(f"알 수 없는 CAFE24_ENGINE: {name}")
+    return sys.modules[__name__]
+
+
+# 단계별 소요 시간 기록
+async def timed_stage(name, awaitable, logger=None):
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.record(f"stage.{name}", elapsed)
+        (logger or log).info(f"[단계] {name}: {elapsed:.2f}초")
+
+
+# 브라우저 준비 + 로그인 (스레드에서 실행)
+def open_browser(driver_manager, resources, mall=default_mall):
+    if driver_manager:
+        driver = driver_manager.ensure_login(mall.login_page, mall)
+        resources['driver'] = driver
+        return driver, driver_manager.wait
+
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver = init_driver()
+    resources['driver'] = driver
+    wait = WebDriverWait(driver, timeout=20)
+    cafe24_login(driver, mall.login_page, wait, mall)
+    return driver, wait
+
+
+# 시트 연결 (스레드에서 실행)
+def connect_sheets(mall=default_mall, gc=None):
+    sheet_manager = GoogleSheetManager(mall.sheet_key, gc)
+    shipping_order_worksheets = sheet_manager.get_worksheet('market_store_order_list')
+    manual_order_worksheets = sheet_manager.get_worksheet('manual_order_list')
+    return sheet_manager, shipping_order_worksheets, manual_order_worksheets
+
+
+# 기록 모드에서 replay에 필요한 시트 원본을 저장 (스레드에서 실행)
+def record_sheet_snapshots(sheets):
+    run_trace.record_sheet('market_store_order_list', sheets['shipping'].get_all_values())
+    run_trace.record_sheet('manual_order_list', sheets['manual'].get_all_values())
+
+
+# 실행 기록(RunJournal)에 저장할 수 있도록 단계 결과를 JSON 값으로 변환
+def encode_orders(orders):
+    return [{key: value for key, value in order.items() if key != 'check_element'} for order in orders]
+
+
+def encode_sheet_data(df):
+    return {
+        'index': [int(row_num) for row_num in df.index],
+        'columns': list(df.columns),
+        'data': df.astype(str).values.tolist(),
+    }
+
+
+def decode_sheet_data(data):
+    import pandas as pd
+
+    df = pd.DataFrame(data['data'], columns=data['columns'], index=data['index'])
+    if '주문상태' in df.columns:
+        df['주문상태'] = df['주문상태'].astype('category')
+    return df
+
+
+# 재시작 후에는 배송중 목록을 다시 읽어서 체크박스와 배송완료 버튼을 찾는다
+def refresh_order_elements(driver, wait, orders, shipping_order_page=shipping_page):
+    fresh_orders, shipping_complete_element = scrape_orders(driver, shipping_order_page, wait)
+    elements = {scraped_order_key(order): order['check_element'] for order in fresh_orders}
+    for order in orders:
+        order['check_element'] = elements.get(scraped_order_key(order))
+    return shipping_complete_element
+
+
+async def main(logger=None, send_alert=None, driver_manager=None, run_stats=None,
+               mall=default_mall, http_client=None, sheets_client=None):
+    logger = logger or log
+    resources = {}
+    store_api = None
+    status_cache = None
+    state_store = None
+    run_start = time.perf_counter()
+    journal = RunJournal(mall.path_for(RUN_JOURNAL_PATH))
+    metrics.reset(journal.run_id)
+    # 이 실행에서 남기는 로그에 run_id/mall을 붙인다
+    set_log_context(run_id=journal.run_id, mall=mall.name)
+    if run_trace.TRACE_RECORD:
+        run_trace.start_recording(journal.run_id, mall.name)
+    profiling = ExitStack()
+    global _profiled
+    if PROFILE_MODE and not _profiled:
+        # 프로파일링은 프로세스당 한 번의 실행에만 적용
+        _profiled = True
+        profiling.enter_context(profile_run(run_id=journal.run_id))
+    if journal.resumed:
+        logger.info(f"이전 실행({journal.run_id})을 이어서 진행합니다. 완료된 단계: {journal.completed_stages}")
 
     try:
-        driver = init_driver()
-        wait = WebDriverWait(driver, timeout=20)
-        alert = Alert(driver)
-
-        sheet_manager = GoogleSheetManager()
-        # service_worksheets = sheet_manager.get_worksheet('market_service_list')
-        shipping_order_worksheets = sheet_manager.get_worksheet('market_store_order_list')
-        manual_order_worksheets = sheet_manager.get_worksheet('manual_order_list')
-
-        # service_sheet_data = sheet_manager.get_sheet_data('market_service_list')
-        shipping_order_data = sheet_manager.get_sheet_data('market_store_order_list')
-        # manual_order_sheet_data = sheet_manager.get_sheet_data('manual_order_list')
-
-        store_api = StoreAPI(store_api_key)
-
-        cafe24_login(driver, login_page, wait)
-        order_list = scrape_orders(driver, shipping_page, wait)
-        orders, shipping_complete_element = order_list
-
-        check_orders = await check_order(orders, shipping_order_data, store_api)
-
-        processed_orders, manual_orders = check_orders
-        print('-------------------------------')
-        print('완료된 주문목록', processed_orders)
-        print('-------------------------------')
-        if len(manual_orders) > 0:
-            process_manual_order(manual_order_worksheets, manual_orders, make_hook_url, sheet_manager)
-        if len(processed_orders) > 0:
-            check_orders = process_orders(shipping_order_worksheets, processed_orders)
-            process_eship(driver, check_orders, shipping_complete_element, alert, wait)
+        engine = load_cafe24_engine()
+        store_api = AsyncStoreAPI(mall.store_api_key, client=http_client)
+        status_cache = StatusCache(mall.path_for(STATE_DB_PATH))
+        state_store = OrderStateStore(mall.path_for(STATE_DB_PATH))
+        browser = {}
+        sheets = {}
+
+        # 브라우저는 실제로 필요한 단계에서 한 번만 준비
+        async def get_browser():
+            if not browser:
+                browser['driver'], browser['wait'] = await journal.run_stage(
+                    'login',
+                    lambda: timed_stage('브라우저/로그인', asyncio.to_thread(engine.open_browser, driver_manager, resources, mall), logger),
+                    checkpoint=False, logger=logger
+                )
+            return browser['driver'], browser['wait']
+
+        async def get_sheets():
+            if not sheets:
+                sheets['manager'], sheets['shipping'], sheets['manual'] = await asyncio.to_thread(connect_sheets, mall, sheets_client)
+            return sheets
+
+        async def scrape():
+            driver, wait = await get_browser()
+            orders, browser['shipping_complete_element'] = await timed_stage(
+                '주문 크롤링', asyncio.to_thread(engine.scrape_orders, driver, mall.shipping_page, wait), logger)
+            run_trace.record_scraped(orders)
+            return orders
+
+        async def sheet_snapshot():
+            await get_sheets()
+            if run_trace.is_recording():
+                await asyncio.to_thread(record_sheet_snapshots, sheets)
+            return await timed_stage(
+                '시트 스냅샷', asyncio.to_thread(get_shipping_order_data, sheets['manager']), logger)
+
+        # 브라우저, 시트, API 클라이언트 준비는 서로 독립적이므로 동시에 진행
+        results = await asyncio.gather(
+            journal.run_stage('scrape', scrape, encode=encode_orders,
+                              decode=lambda orders: [dict(order) for order in orders], logger=logger),
+            journal.run_stage('sheet_snapshot', sheet_snapshot,
+                              encode=encode_sheet_data, decode=decode_sheet_data, logger=logger),
+            timed_stage('API 준비', store_api.warm_up(), logger),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        orders, shipping_order_data, _ = results
+
+        check_stats = {}
+
+        async def status_check():
+            return await timed_stage(
+                '주문 상태 확인',
+                check_order(orders, shipping_order_data, store_api,
+                            status_cache=status_cache, state_store=state_store, stats=check_stats),
+                logger
+            )
+
+        def encode_check_result(result):
+            return {
+                'processed': encode_orders(result[0]),
+                'manual': [[str(value) for value in row] for row in result[1]],
+                'stats': check_stats,
+            }
+
+        def decode_check_result(data):
+            check_stats.update(data['stats'])
+            # 기록 원본이 바뀌지 않도록 복사해서 사용
+            return [[dict(order) for order in data['processed']], [list(row) for row in data['manual']]]
+
+        check_result = await journal.run_stage(
+            'status_check', status_check,
+            encode=encode_check_result, decode=decode_check_result, logger=logger
+        )
+        processed_orders, manual_orders = check_result
+        if run_stats is not None:
+            run_stats.update(check_stats)
+        logger.info(f"완료된 주문목록: {len(processed_orders)}건")
+        logger.debug("완료된 주문목록: %s", encode_orders(processed_orders))
+
+        async def manual_stage():
+            if len(manual_orders) == 0:
+                return
+
+            async def run():
+                await get_sheets()
+                await timed_stage('수동주문 처리', asyncio.to_thread(
+                    process_manual_order, sheets['manual'], manual_orders, mall.make_hook_url, sheets['manager'], state_store), logger)
+
+            await journal.run_stage('manual', run, logger=logger)
+
+        async def complete_stage():
+            if len(processed_orders) == 0:
+                return
+
+            async def sheet_update():
+                await get_sheets()
+                return await timed_stage('시트 업데이트', asyncio.to_thread(
+                    process_orders, sheets['manager'], processed_orders, state_store, mall.path_for(SHEET_LOCK_PATH)), logger)
+
+            check_orders = await journal.run_stage(
+                'sheet_update', sheet_update,
+                encode=lambda result: result[0],
+                decode=lambda done: [done, processed_orders],
+                logger=logger
+            )
+            if not check_orders[0]:
+                return
+
+            async def eship_click():
+                driver, wait = await get_browser()
+                shipping_complete_element = browser.get('shipping_complete_element')
+                if not shipping_complete_element or not all(order.get('check_element') for order in processed_orders):
+                    shipping_complete_element = await asyncio.to_thread(
+                        engine.refresh_order_elements, driver, wait, processed_orders, mall.shipping_page)
+                selected = await asyncio.to_thread(engine.select_order_checkboxes, driver, processed_orders, wait)
+                if not selected:
+                    logger.info('배송완료 처리할 주문이 목록에 없습니다.')
+                    return
+                await timed_stage('배송완료 처리', asyncio.to_thread(
+                    engine.process_eship, driver, check_orders, shipping_complete_element, None, wait), logger)
+                state_store.mark_action(selected, 'eship_clicked')
+
+            await journal.run_stage('eship_click', eship_click, logger=logger)
+
+        # 수동주문 처리(시트/웹훅)와 배송완료 처리(시트/브라우저)는 동시에 진행
+        results = await asyncio.gather(manual_stage(), complete_stage(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        journal.finish()
         return processed_orders
     except Exception as e:
         error_msg = f"Automation Check critical error occurred: {e}"
+        if run_stats is not None:
+            run_stats['failed'] = True
 
-        if logger:
-            logger.error(error_msg)
-            logger.error(traceback.format_exc())
-        else:
-            print(f"Error: {e}")
-            traceback.print_exc()
+        logger.exception(error_msg)
 
         if send_alert:
             await send_alert(f"{error_msg}\n\n{traceback.format_exc()}")
             
         return []
     finally:
-        print('완료')
-        driver.quit()
-        # 비동기 세션 정리
+        logger.info('완료')
+        # driver_manager가 있으면 브라우저는 다음 실행을 위해 유지
+        if resources.get('driver') and not driver_manager:
+            resources['driver'].quit()
+        if store_api:
+            if run_stats is not None:
+                run_stats['rate_limited'] = store_api.rate_limited_count
+            await store_api.aclose()
+        if status_cache:
+            status_cache.prune()
+            status_cache.close()
+        if state_store:
+            state_store.prune()
+            state_store.close()
+        profiling.close()
+        logger.info(f"[단계] 전체 실행: {time.perf_counter() - run_start:.2f}초")
+        try:
+            metrics.write_summary()
+            metrics.write_prometheus()
+        except OSError as e:
+            logger.warning(f"실행 지표 저장 실패: {e}")
+        try:
+            run_trace.stop_recording()
+        except OSError as e:
+            logger.warning(f"실행 기록 저장 실패: {e}")
 
 if __name__ == "__main__":
-    import asyncio
     loop = asyncio.get_event_loop()
     try:
         orders = loop.run_until_complete(main())
@@ -0,0 +1 @@
+"""외부 서비스 없이 주문 확인 파이프라인의 성능을 재는 벤치마크 (python -m bench)"""
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import logging
+import tracemalloc
+
+from contextlib import contextmanager
+
+# automation_check는 pandas를 처음 쓸 때 import한다. 단계 시간에 import 시간이 섞이지 않도록 미리 불러둔다
+import pandas  # noqa: F401
+import automation_check as ac
+from bench.fakes import FakeServer, FakeSheetManager, build_sheets
+from log_config import LOGGER_NAME
+
+
+@contextmanager
+def quiet_pipeline_logs():
+    """파이프라인 로그(market_automation_check)를 버린다.
+
+    벤치마크에서는 setup_logger()를 호출하지 않으므로 핸들러가 없는 로그는 logging.lastResort로
+    stderr에 찍힌다. 로그 출력 비용이 측정에 섞이지 않도록 레벨을 올려 레코드를 만들지 않게 한다.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    level = logger.level
+    logger.setLevel(logging.CRITICAL + 1)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+# (시트 행 수, 크롤링된 배송중 주문 수)
+SCENARIOS = [
+    (10, 10),
+    (1000, 10),
+    (1000, 100),
+    (1000, 1000),
+    (20000, 10),
+    (20000, 100),
+    (20000, 1000),
+]
+
+
+def run_scenario(server, sheet_rows, scraped_orders, chunk_size):
+    shipping, manual, orders = build_sheets(sheet_rows, scraped_orders)
+    sheet_manager = FakeSheetManager([shipping, manual])
+    server.counters.clear()
+    timings = {}
+
+    async def check():
+        store_api = ac.AsyncStoreAPI('bench-key')
+        store_api.base_url = f"{server.base_url}/api"
+        try:
+            return await ac.check_order(orders, shipping_order_data, store_api, chunk_size=chunk_size)
+        finally:
+            await store_api.aclose()
+
+    tracemalloc.start()
+    total_start = time.perf_counter()
+    # 파이프라인의 로그 출력 비용은 측정에서 제외
+    with quiet_pipeline_logs():
+        start = time.perf_counter()
+        shipping_order_data = ac.get_shipping_order_data(sheet_manager)
+        timings['sheet_snapshot'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        processed_orders, manual_orders = asyncio.run(check())
+        timings['check_order'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ac.process_orders(sheet_manager, processed_orders)
+        timings['process_orders'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if manual_orders:
+            ac.add_manual_order_sheets(manual, manual_orders)
+            dispatcher = ac.ManualOrderDispatcher(f"{server.base_url}/hook")
+            ac.alert_manual_orders(dispatcher.hook_url, sheet_manager, manual_orders, dispatcher=dispatcher)
+        timings['manual_orders'] = time.perf_counter() - start
+    timings['total'] = time.perf_counter() - total_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'sheet_rows': len(shipping.rows) - 1,
+        'scraped_orders': scraped_orders,
+        'processed_orders': len(processed_orders),
+        'manual_orders': len(manual_orders),
+        'seconds': {name: round(value, 4) for name, value in timings.items()},
+        'store_api_calls': sum(count for name, count in server.counters.items() if name.startswith('api.')),
+        'webhook_calls': server.counters['webhook'],
+        'sheet_calls': dict(sheet_manager.calls),
+        'peak_memory_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def run_selenium_scenario(server, scraped_orders):
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver = ac.init_driver()
+    try:
+        wait = WebDriverWait(driver, timeout=20)
+        start = time.perf_counter()
+        with quiet_pipeline_logs():
+            orders, _ = ac.scrape_orders(driver, f"{server.base_url}/shipping?rows={scraped_orders}", wait)
+        return {
+            'scraped_orders': scraped_orders,
+            'found_orders': len(orders),
+            'seconds': {'scrape_orders': round(time.perf_counter() - start, 4)},
+        }
+    finally:
+        driver.quit()
+
+
+def run_http_scenario(server, scraped_orders):
+    import cafe24_http
+    from mall_config import MallConfig
+
+    base_url = server.base_url
+    username, password = server.admin_credentials
+    mall = MallConfig(
+        'bench', username, password, f"{base_url}/admin/login", f"{base_url}/admin/dashboard",
+        f"{base_url}/admin/shipping?rows={scraped_orders}", 'bench-sheet', 'bench-key', f"{base_url}/hook"
+    )
+    client = cafe24_http.Cafe24HttpClient(mall, cookie_file=os.devnull)
+    try:
+        cafe24_http.cafe24_login(client, mall.login_page, mall=mall)
+        start = time.perf_counter()
+        orders, _ = cafe24_http.scrape_orders(client, mall.shipping_page)
+        return {
+            'scraped_orders': scraped_orders,
+            'found_orders': len(orders),
+            'seconds': {'http_scrape_orders': round(time.perf_counter() - start, 4)},
+        }
+    finally:
+        client.close()
+
+
+def print_result(result):
+    seconds = ' '.join(f"{name}={value:.3f}s" for name, value in result['seconds'].items())
+    line = f"rows={result.get('sheet_rows', '-'):>6} orders={result['scraped_orders']:>5} | {seconds}"
+    if 'store_api_calls' in result:
+        line += (f" | api={result['store_api_calls']} webhook={result['webhook_calls']}"
+                 f" sheets={sum(result['sheet_calls'].values())} peak={result['peak_memory_mb']}MB")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='주문 확인 파이프라인 오프라인 벤치마크')
+    parser.add_argument('--latency', type=float, default=0.05, help='가짜 스토어 API/웹훅 응답 지연(초)')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='429로 응답할 비율')
+    parser.add_argument('--chunk-size', type=int, default=ac.STATUS_CHUNK_SIZE)
+    parser.add_argument('--scenario', action='append', default=None,
+                        help='ROWSxORDERS 형식 (예: 1000x100), 여러 번 지정 가능')
+    parser.add_argument('--selenium', action='store_true', help='로컬 배송중 목록 페이지로 Chrome 크롤링도 측정')
+    parser.add_argument('--http', action='store_true', help='가짜 Cafe24 관리자로 HTTP 엔진 크롤링도 측정')
+    parser.add_argument('--json', help='결과를 저장할 JSON 파일')
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.scenario:
+        scenarios = [tuple(int(value) for value in scenario.lower().split('x')) for scenario in args.scenario]
+
+    results = []
+    with FakeServer(latency=args.latency, rate_limit_rate=args.rate_limit) as server:
+        for sheet_rows, scraped_orders in scenarios:
+            result = run_scenario(server, sheet_rows, scraped_orders, args.chunk_size)
+            print_result(result)
+            results.append(result)
+
+        if args.selenium:
+            for scraped_orders in sorted({orders for _, orders in scenarios}):
+                result = run_selenium_scenario(server, scraped_orders)
+                print_result(result)
+                results.append(result)
+
+        if args.http:
+            for scraped_orders in sorted({orders for _, orders in scenarios}):
+                result = run_http_scenario(server, scraped_orders)
+                print_result(result)
+                results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
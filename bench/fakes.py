@@ -0,0 +1,452 @@
+import os
+import json
+import time
+import uuid
+import random
+import threading
+
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+from gspread.utils import a1_range_to_grid_range
+
+from automation_check import GoogleSheetManager
+
+
+SHIPPING_LIST_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shipping_list.html')
+
+# 벤치마크용 market_store_order_list / manual_order_list 헤더
+SHIPPING_ORDER_HEADER = [
+    '마켓주문번호', '스토어주문번호', '주문자정보', '상품명', '옵션', '수량', '링크', '서비스', '주문일시', '주문상태', '비고'
+]
+MANUAL_ORDER_HEADER = SHIPPING_ORDER_HEADER[:9] + ['처리상태', '메모']
+
+
+ADMIN_LOGIN_HTML = """<!DOCTYPE html>
+<html><body>
+<form method="post" action="/admin/login">
+<input type="hidden" name="csrf_token" value="{token}">
+<input type="text" name="loginId"><input type="password" name="loginPasswd">
+<button type="submit" class="btnStrong large">로그인</button>
+</form>
+</body></html>
+"""
+
+
+ADMIN_PASSWORD_CHANGE_HTML = """<!DOCTYPE html>
+<html><body>
+<form method="post" action="/admin/password/change">
+<input type="password" name="newPasswd"><input type="password" name="newPasswdConfirm">
+<button type="submit">비밀번호 변경</button>
+</form>
+{later}
+</body></html>
+"""
+ADMIN_PASSWORD_LATER_FORM = (
+    '<form method="post" action="/admin/password/later"><button type="submit">다음에 변경하기</button></form>'
+)
+
+
+def render_admin_shipping_list(rows, shipped=(), limit=None):
+    """서버에서 그린 Cafe24 배송중 목록 (HTTP 엔진용). 주문 형식은 shipping_list.html과 같다.
+
+    shipped에 있는 체크박스 값의 주문은 배송완료 처리된 것으로 보고 목록에서 뺀다.
+    limit이 있으면 실제 관리자 화면처럼 첫 페이지의 limit건만 그린다.
+    """
+    indexes = [i for i in range(rows) if f"chk-{i}" not in shipped][:limit]
+    if not indexes:
+        body = '<tbody class="empty"><tr><td colspan="9">검색된 주문내역이 없습니다.</td></tr></tbody>'
+    else:
+        body = ''.join(
+            '<tbody class="center"><tr>'
+            f'<td><input type="checkbox" name="order_id[]" class="chkbox rowCk" value="chk-{i}"></td>'
+            f'<td class="orderNum">2024-01-01 10:00:00<br>{market_order_num(i)} <a href="#">상세</a></td>'
+            '</tr></tbody>'
+            for i in indexes
+        )
+    return (
+        '<!DOCTYPE html><html><body>'
+        '<button type="button" id="eShippedEndBtn" data-action="/admin/shipping/complete">배송완료처리</button>'
+        f'<table id="searchResultList">{body}</table>'
+        '</body></html>'
+    )
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _admin_session(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        return cookie['ECSESSID'].value if 'ECSESSID' in cookie else None
+
+    def _admin_logged_in(self):
+        return self._admin_session() in self.server.admin_sessions
+
+    def _send_password_change(self, headers=None):
+        later = ADMIN_PASSWORD_LATER_FORM if self.server.admin_password_change == 'optional' else ''
+        self._send(200, ADMIN_PASSWORD_CHANGE_HTML.format(later=later), 'text/html; charset=utf-8', headers)
+
+    def do_HEAD(self):
+        self.server.count('head')
+        self.send_response(200 if urlsplit(self.path).path == '/api' else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = parts.path
+        if path == '/shipping':
+            self.server.count('shipping_page')
+            with open(SHIPPING_LIST_HTML, encoding='utf-8') as f:
+                self._send(200, f.read(), 'text/html; charset=utf-8')
+        elif path.startswith('/admin/'):
+            self.server.count(f"admin.{path[len('/admin/'):]}")
+            # 세션이 없으면 Cafe24처럼 로그인 폼을 보여준다
+            if path == '/admin/login' or not self._admin_logged_in():
+                self._send(200, ADMIN_LOGIN_HTML.format(token=self.server.admin_csrf_token), 'text/html; charset=utf-8')
+            elif self._admin_session() in self.server.admin_password_pending:
+                # 비밀번호 변경 안내를 넘기기 전에는 어느 페이지든 안내 화면을 보여준다
+                self._send_password_change()
+            elif path == '/admin/dashboard':
+                self._send(200, '<html><body>대시보드</body></html>', 'text/html; charset=utf-8')
+            elif path == '/admin/shipping':
+                query = parse_qs(parts.query)
+                rows = int(query.get('rows', [self.server.admin_rows])[0])
+                with self.server.lock:
+                    shipped = set(self.server.shipped_ids)
+                limit = int(query['limit'][0]) if 'limit' in query else None
+                self._send(200, render_admin_shipping_list(rows, shipped, limit), 'text/html; charset=utf-8')
+            else:
+                self._send(404, '{}')
+        else:
+            self._send(404, '{}')
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        time.sleep(self.server.latency)
+
+        if path == '/admin/login':
+            self.server.count('admin.login_submit')
+            form = {key: values[0] for key, values in parse_qs(body).items()}
+            if (form.get('csrf_token') == self.server.admin_csrf_token and
+                    (form.get('loginId'), form.get('loginPasswd')) == self.server.admin_credentials):
+                session_id = uuid.uuid4().hex
+                self.server.admin_sessions.add(session_id)
+                headers = {'Set-Cookie': f"ECSESSID={session_id}; Path=/"}
+                if self.server.admin_password_change:
+                    self.server.admin_password_pending.add(session_id)
+                    self._send_password_change(headers)
+                else:
+                    self._send(200, '<html><body>로그인 완료</body></html>', 'text/html; charset=utf-8', headers)
+            else:
+                self._send(200, ADMIN_LOGIN_HTML.format(token=self.server.admin_csrf_token), 'text/html; charset=utf-8')
+            return
+
+        if path == '/admin/password/later':
+            self.server.count('admin.password_later')
+            self.server.admin_password_pending.discard(self._admin_session())
+            self._send(200, '<html><body>대시보드</body></html>', 'text/html; charset=utf-8')
+            return
+
+        if path == '/admin/shipping/complete':
+            self.server.count('admin.shipping_complete')
+            if not self._admin_logged_in():
+                self._send(403, '{"error": "login required"}')
+                return
+            with self.server.lock:
+                failing = self.server.eship_failures > 0
+                self.server.eship_failures -= failing
+            if failing:
+                self._send(500, '{"error": "internal error"}')
+                return
+            selected = parse_qs(body).get('order_id[]', [])
+            with self.server.lock:
+                self.server.shipped_ids.extend(selected)
+            self._send(200, json.dumps({'result': 'success', 'count': len(selected)}))
+            return
+
+        if path == '/hook':
+            self.server.count('webhook')
+            self.server.webhook_payloads.append(json.loads(body or 'null'))
+            self._send(200, '{"accepted": true}')
+            return
+
+        if path != '/api':
+            self._send(404, '{}')
+            return
+
+        params = {key: values[0] for key, values in parse_qs(body).items()}
+        action = params.get('action')
+        self.server.count(f"api.{action}")
+        if self.server.rate_limit_rate and self.server.random() < self.server.rate_limit_rate:
+            self.server.count('api.429')
+            self._send(429, '{"error": "Too many requests"}')
+            return
+
+        if action == 'status' and 'orders' in params:
+            result = {order_id: self.server.order_status(order_id) for order_id in params['orders'].split(',')}
+        elif action == 'status':
+            result = self.server.order_status(params.get('order', ''))
+        elif action == 'balance':
+            result = {'balance': '100.00', 'currency': 'USD'}
+        else:
+            result = {'error': 'Incorrect request'}
+        self._send(200, json.dumps(result))
+
+
+class FakeServer(ThreadingHTTPServer):
+    """스토어 API(/api), Make 웹훅(/hook), Cafe24 배송중 목록(/shipping)을 흉내 내는 로컬 HTTP 서버.
+
+    /admin/* 는 HTTP 엔진용 Cafe24 관리자 흉내다: 로그인 폼(/admin/login), 세션 확인(/admin/dashboard),
+    서버에서 그린 배송중 목록(/admin/shipping), 배송완료 처리 요청(/admin/shipping/complete).
+
+    latency: 요청마다 지연(초)
+    status_mix: 스토어 주문 상태별 가중치 (주문번호 기준으로 항상 같은 상태를 돌려준다)
+    rate_limit_rate: 429로 응답할 비율
+    admin_rows: /admin/shipping 에 표시할 배송중 주문 수 (?rows=N 으로 바꿀 수 있다)
+    eship_failures: 배송완료 처리 요청을 이 횟수만큼 500으로 실패시킨다
+    admin_password_change: 로그인 직후 비밀번호 변경 안내 화면을 보여준다.
+        'optional'이면 '다음에 변경하기'(/admin/password/later)로 넘길 수 있고, 'required'면 넘길 수 없다
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, status_mix=None, rate_limit_rate=0.0, seed=0, admin_rows=10):
+        super().__init__(('127.0.0.1', 0), _FakeHandler)
+        self.latency = latency
+        self.status_mix = status_mix or {'Completed': 70, 'In progress': 20, 'Partial': 5, 'Canceled': 5}
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self.counters = Counter()
+        self.webhook_payloads = []
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.thread = None
+        self.admin_rows = admin_rows
+        self.admin_credentials = ('bench', 'bench-password')
+        self.admin_csrf_token = uuid.uuid4().hex
+        self.admin_sessions = set()
+        self.admin_password_change = ''
+        self.admin_password_pending = set()
+        self.shipped_ids = []
+        self.eship_failures = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+    def random(self):
+        with self.lock:
+            return self._random.random()
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def order_status(self, order_id):
+        if not order_id.isdigit():
+            return {'error': 'Incorrect order ID'}
+        statuses, weights = zip(*self.status_mix.items())
+        status = random.Random(f"{self.seed}-{order_id}").choices(statuses, weights)[0]
+        return {'charge': '0.10', 'start_count': '0', 'status': status, 'remains': '0', 'currency': 'USD'}
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class _Cell:
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+class InMemoryWorksheet:
+    """gspread.Worksheet 중 파이프라인이 쓰는 메서드만 메모리에서 구현. 호출 수는 calls에 모은다."""
+
+    def __init__(self, title, rows):
+        self.title = title
+        self.rows = [list(row) for row in rows]
+        self.calls = Counter()
+
+    def _width(self):
+        return max((len(row) for row in self.rows), default=0)
+
+    def _cell(self, row_idx, col_idx):
+        if row_idx < len(self.rows) and col_idx < len(self.rows[row_idx]):
+            return self.rows[row_idx][col_idx]
+        return ''
+
+    def _set(self, row_idx, col_idx, value):
+        while len(self.rows) <= row_idx:
+            self.rows.append([])
+        row = self.rows[row_idx]
+        while len(row) <= col_idx:
+            row.append('')
+        row[col_idx] = str(value)
+
+    def get_all_values(self):
+        self.calls['get_all_values'] += 1
+        width = self._width()
+        return [row + [''] * (width - len(row)) for row in self.rows]
+
+    def get_all_records(self):
+        self.calls['get_all_records'] += 1
+        header = self.rows[0] if self.rows else []
+        return [dict(zip(header, row + [''] * (len(header) - len(row)))) for row in self.rows[1:]]
+
+    def row_values(self, row):
+        self.calls['row_values'] += 1
+        values = list(self.rows[row - 1]) if row <= len(self.rows) else []
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def find(self, query):
+        self.calls['find'] += 1
+        for row_idx, row in enumerate(self.rows):
+            for col_idx, value in enumerate(row):
+                if value == query:
+                    return _Cell(row_idx + 1, col_idx + 1, value)
+        return None
+
+    def batch_get(self, ranges, major_dimension=None):
+        self.calls['batch_get'] += 1
+        results = []
+        for a1_range in ranges:
+            grid = a1_range_to_grid_range(a1_range)
+            start_row = grid.get('startRowIndex', 0)
+            end_row = grid.get('endRowIndex', len(self.rows))
+            start_col = grid.get('startColumnIndex', 0)
+            end_col = grid.get('endColumnIndex', self._width())
+            block = [
+                [self._cell(row_idx, col_idx) for col_idx in range(start_col, end_col)]
+                for row_idx in range(start_row, min(end_row, len(self.rows)))
+            ]
+            if major_dimension == 'COLUMNS':
+                block = [list(column) for column in zip(*block)] if block else []
+            # Sheets API처럼 뒤쪽 빈 값은 잘라서 돌려준다
+            for values in block:
+                while values and values[-1] == '':
+                    values.pop()
+            while block and not block[-1]:
+                block.pop()
+            results.append(block)
+        return results
+
+    def batch_update(self, data):
+        self.calls['batch_update'] += 1
+        for item in data:
+            grid = a1_range_to_grid_range(item['range'])
+            for row_offset, values in enumerate(item['values']):
+                for col_offset, value in enumerate(values):
+                    self._set(grid['startRowIndex'] + row_offset, grid['startColumnIndex'] + col_offset, value)
+
+    def update_cell(self, row, col, value):
+        self.calls['update_cell'] += 1
+        self._set(row - 1, col - 1, value)
+
+    def append_row(self, values):
+        self.calls['append_row'] += 1
+        self.rows.append([str(value) for value in values])
+
+    def append_rows(self, values):
+        self.calls['append_rows'] += 1
+        self.rows.extend([str(value) for value in row] for row in values)
+
+    def delete_rows(self, start_index, end_index=None):
+        self.calls['delete_rows'] += 1
+        del self.rows[start_index - 1:(end_index or start_index)]
+
+
+class FakeSheetManager(GoogleSheetManager):
+    """인증 없이 InMemoryWorksheet를 돌려주는 GoogleSheetManager"""
+
+    def __init__(self, worksheets):
+        self.gc = None
+        self.doc = None
+        self.headers = {}
+        self.worksheets = {worksheet.title: worksheet for worksheet in worksheets}
+
+    def initialize_connection(self):
+        pass
+
+    def get_worksheet(self, sheet_name):
+        return self.worksheets[sheet_name]
+
+    def get_or_add_worksheet(self, sheet_name, header):
+        if sheet_name not in self.worksheets:
+            self.worksheets[sheet_name] = InMemoryWorksheet(sheet_name, [header])
+        return self.worksheets[sheet_name]
+
+    def delete_row_ranges(self, sheet_name, row_ranges):
+        worksheet = self.worksheets[sheet_name]
+        for start, end in sorted(row_ranges, reverse=True):
+            worksheet.delete_rows(start, end)
+
+    @property
+    def calls(self):
+        total = Counter()
+        for worksheet in self.worksheets.values():
+            total.update(worksheet.calls)
+        return total
+
+
+def market_order_num(i):
+    return f"20240101-{i:07d}"
+
+
+def build_sheets(sheet_rows, scraped_orders, multi_every=5):
+    """scraped_orders개의 배송중 주문이 포함된 sheet_rows행짜리 시트와 크롤링 결과를 만든다.
+
+    multi_every번째 마켓주문마다 스토어주문을 2개 연결하고, 나머지 행은 배송완료 이력으로 채운다.
+    """
+    rows = [SHIPPING_ORDER_HEADER]
+    scraped = []
+    store_order_id = 1
+    for i in range(scraped_orders):
+        num = market_order_num(i)
+        scraped.append({
+            'market_order_num': num, 'scraped_order_num': num, 'checkbox_id': f"chk-{i}", 'check_element': None
+        })
+        for _ in range(2 if multi_every and i % multi_every == 0 else 1):
+            rows.append(_order_row(num, store_order_id, '배송중'))
+            store_order_id += 1
+
+    i = scraped_orders
+    while len(rows) - 1 < sheet_rows:
+        rows.append(_order_row(market_order_num(i), store_order_id, '배송완료'))
+        store_order_id += 1
+        i += 1
+
+    shipping = InMemoryWorksheet('market_store_order_list', rows)
+    manual = InMemoryWorksheet('manual_order_list', [MANUAL_ORDER_HEADER])
+    return shipping, manual, scraped
+
+
+def _order_row(num, store_order_id, status):
+    return [
+        num, str(store_order_id), '홍길동\n010-0000-0000\nuser01', '상품', '옵션', '100', 'https://example.com',
+        '서비스', "2024-01-01\n(2024-01-01 10:00:00)", status, ''
+    ]
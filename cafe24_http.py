@@ -0,0 +1,392 @@
+import os
+import json
+import time
+import threading
+import requests
+
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+
+from automation_check import (
+    default_mall, with_page_limit, read_all_pages, normalize_market_order_num, scraped_order_key, CAFE24_COOKIE_FILE,
+)
+from metrics import metrics, timed
+from log_config import get_logger
+
+
+# 배송완료 처리 요청 주소. 비워두면 배송중 목록의 #eShippedEndBtn data-action 값을 사용
+CAFE24_ESHIP_URL = os.getenv("CAFE24_ESHIP_URL", "")
+# 배송완료 처리 요청에 선택한 주문(체크박스 값)을 담는 필드 이름. 비워두면 배송중 목록 체크박스의 name을 사용
+CAFE24_ESHIP_ORDER_FIELD = os.getenv("CAFE24_ESHIP_ORDER_FIELD", "")
+CAFE24_HTTP_TIMEOUT = float(os.getenv("CAFE24_HTTP_TIMEOUT", "20"))
+
+log = get_logger('cafe24_http')
+
+# 배송완료 처리 요청 주소와 선택한 주문(체크박스 값)을 담을 필드 이름
+EshipRequest = namedtuple('EshipRequest', 'url field')
+
+
+class _FormParser(HTMLParser):
+    """페이지의 form별 action과 input 값, loginId 입력란 존재 여부를 읽는다."""
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self.has_login_input = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self.forms.append({
+                'action': attrs.get('action', ''), 'method': attrs.get('method', 'get'), 'fields': {}, 'passwords': []
+            })
+        elif tag == 'input':
+            if attrs.get('name') == 'loginId':
+                self.has_login_input = True
+            if self.forms and attrs.get('name'):
+                self.forms[-1]['fields'][attrs['name']] = attrs.get('value') or ''
+                if attrs.get('type') == 'password':
+                    self.forms[-1]['passwords'].append(attrs['name'])
+
+    @property
+    def password_change(self):
+        # 로그인 폼이 아닌데 비밀번호 입력란이 있으면 비밀번호 변경 안내 화면이다
+        return any(form['passwords'] and 'loginId' not in form['fields'] for form in self.forms)
+
+
+class ShippingListParser(HTMLParser):
+    """배송중 목록 HTML에서 SCRAPE_ORDERS_SCRIPT와 같은 정보를 읽는다.
+
+    #searchResultList 안의 tbody.center마다 td.orderNum 텍스트(줄바꿈 포함)와 .chkbox 값을 모으고,
+    #eShippedEndBtn의 속성을 함께 저장한다.
+    """
+
+    _LINE_BREAK_TAGS = ('br', 'div', 'p', 'li')
+    # 닫는 태그가 없는 요소는 깊이 계산에서 제외
+    _VOID_TAGS = ('area', 'br', 'col', 'hr', 'img', 'input', 'link', 'meta', 'wbr')
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.empty = False
+        self.eship_button = None
+        self.checkbox_names = set()
+        self._list_depth = 0
+        self._row = None
+        self._order_num_depth = 0
+        self._order_num_text = []
+
+    @staticmethod
+    def _classes(attrs):
+        return (attrs.get('class') or '').split()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if attrs.get('id') == 'eShippedEndBtn':
+            self.eship_button = attrs
+        if attrs.get('id') == 'searchResultList':
+            self._list_depth = 1
+            return
+        if not self._list_depth:
+            return
+        if tag not in self._VOID_TAGS:
+            self._list_depth += 1
+
+        classes = self._classes(attrs)
+        if tag == 'tbody':
+            if 'center' in classes:
+                self._row = {'order_num_text': None, 'checkbox_id': ''}
+                self.rows.append(self._row)
+            elif 'empty' in classes:
+                self.empty = True
+        elif self._row is not None:
+            if tag == 'td' and 'orderNum' in classes:
+                self._order_num_depth = self._list_depth
+                self._order_num_text = []
+            elif tag == 'input' and 'chkbox' in classes:
+                self._row['checkbox_id'] = attrs.get('value') or attrs.get('id') or ''
+                if attrs.get('name'):
+                    self.checkbox_names.add(attrs['name'])
+            elif self._order_num_depth and tag in self._LINE_BREAK_TAGS:
+                self._order_num_text.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self._VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not self._list_depth or tag in self._VOID_TAGS:
+            return
+        if self._order_num_depth and self._list_depth == self._order_num_depth:
+            lines = [' '.join(line.split()) for line in ''.join(self._order_num_text).split('\n')]
+            self._row['order_num_text'] = '\n'.join(line for line in lines if line)
+            self._order_num_depth = 0
+        if tag == 'tbody':
+            self._row = None
+        self._list_depth -= 1
+
+    def handle_data(self, data):
+        if self._order_num_depth:
+            # 소스의 줄바꿈은 innerText처럼 공백으로 취급하고, <br> 등만 줄을 나눈다
+            self._order_num_text.append(data.replace('\n', ' '))
+
+
+class Cafe24HttpClient:
+    """Chrome 없이 Cafe24 관리자 페이지를 다루는 HTTP 세션.
+
+    requests.Session의 keep-alive 커넥션과 쿠키를 실행 사이에 유지하고, 세션 쿠키는
+    DriverManager와 같은 형식(JSON 쿠키 목록)으로 몰별 파일에 저장한다.
+    """
+
+    def __init__(self, mall=default_mall, cookie_file=CAFE24_COOKIE_FILE, timeout=CAFE24_HTTP_TIMEOUT):
+        self.mall = mall
+        self.cookie_file = mall.path_for(cookie_file)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, **kwargs):
+        response = self.session.get(url, timeout=self.timeout, **kwargs)
+        metrics.record_payload('cafe24_http.get', len(response.content))
+        response.raise_for_status()
+        return response
+
+    def post(self, url, data, **kwargs):
+        response = self.session.post(url, data=data, timeout=self.timeout, **kwargs)
+        metrics.record_payload('cafe24_http.post', len(response.content))
+        response.raise_for_status()
+        return response
+
+    def is_logged_in(self):
+        # 세션이 만료되면 로그인 폼이, 비밀번호 변경 안내를 넘기지 않았으면 변경 폼이 나온다
+        parser = _FormParser()
+        parser.feed(self.get(self.mall.dashboard_page).text)
+        return not parser.has_login_input and not parser.password_change
+
+    def load_cookies(self):
+        if not os.path.exists(self.cookie_file):
+            return False
+        try:
+            with open(self.cookie_file, encoding='utf-8') as f:
+                cookies = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"쿠키 파일 읽기 실패: {e}")
+            return False
+
+        now = time.time()
+        for cookie in cookies:
+            if cookie.get('expiry') and cookie['expiry'] < now:
+                continue
+            self.session.cookies.set(
+                cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/')
+            )
+        return True
+
+    def save_cookies(self):
+        cookies = [
+            {'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path,
+             **({'expiry': cookie.expires} if cookie.expires else {})}
+            for cookie in self.session.cookies
+        ]
+        try:
+            with open(self.cookie_file, 'w', encoding='utf-8') as f:
+                json.dump(cookies, f)
+        except OSError as e:
+            log.warning(f"쿠키 파일 저장 실패: {e}")
+
+    def ensure_login(self):
+        if self.session.cookies and self.is_logged_in():
+            log.info('기존 Cafe24 세션 사용')
+            return self
+        if self.load_cookies() and self.is_logged_in():
+            log.info('저장된 Cafe24 쿠키로 세션 복원')
+            return self
+
+        cafe24_login(self, self.mall.login_page, mall=self.mall)
+        self.save_cookies()
+        return self
+
+    def close(self):
+        self.session.close()
+
+    # DriverManager 없이 한 번 실행하면 automation_check.main이 실행 끝에 Chrome처럼 닫는다
+    def quit(self):
+        with _clients_lock:
+            if _clients.get(self.mall.name) is self:
+                del _clients[self.mall.name]
+        self.close()
+
+
+# 몰별로 실행 사이에 유지하는 HTTP 세션
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def open_session(mall=default_mall):
+    with _clients_lock:
+        client = _clients.get(mall.name)
+        if client is None:
+            client = _clients[mall.name] = Cafe24HttpClient(mall)
+    return client.ensure_login()
+
+
+def close_sessions():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+# automation_check.open_browser와 같은 형식. driver_manager(Chrome)는 사용하지 않는다
+def open_browser(driver_manager, resources, mall=default_mall):
+    client = open_session(mall)
+    resources['driver'] = client
+    return client, None
+
+
+# 로그인 폼을 읽어 숨은 필드는 그대로 두고 아이디/비밀번호를 채워 전송한다
+@timed('cafe24_http.login')
+def cafe24_login(client, login_page, wait=None, mall=default_mall):
+    response = client.get(login_page)
+    parser = _FormParser()
+    parser.feed(response.text)
+    form = next((form for form in parser.forms if 'loginId' in form['fields']), None)
+    if form is None:
+        raise RuntimeError(f"로그인 폼을 찾을 수 없습니다: {login_page}")
+
+    data = {**form['fields'], 'loginId': mall.username, 'loginPasswd': mall.password}
+    response = client.post(urljoin(response.url, form['action'] or response.url), data)
+    skip_password_change(client, response)
+    if not client.is_logged_in():
+        raise RuntimeError("Cafe24 로그인 실패")
+    log.info('Cafe24 로그인 (HTTP)')
+    return client
+
+
+def resolve_eship_request(page_url, parser):
+    """배송완료 처리 요청 주소와 필드 이름을 정하고 배송중 목록 페이지와 맞는지 확인한다.
+
+    주소나 필드 이름이 틀리면 요청이 2xx로 끝나도 처리되지 않으므로, 시트를 배송완료로 바꾸기 전
+    (크롤링 단계)에 실패시킨다. 페이지에서 확인할 수 없으면 환경 변수로 지정한 값만 사용한다.
+    """
+    url = CAFE24_ESHIP_URL or (parser.eship_button or {}).get('data-action', '')
+    if not url:
+        raise RuntimeError("배송완료 요청 주소를 찾을 수 없습니다. CAFE24_ESHIP_URL을 지정하세요.")
+
+    names = parser.checkbox_names
+    if CAFE24_ESHIP_ORDER_FIELD:
+        if names and CAFE24_ESHIP_ORDER_FIELD not in names:
+            raise RuntimeError(
+                f"CAFE24_ESHIP_ORDER_FIELD({CAFE24_ESHIP_ORDER_FIELD})가 배송중 목록 체크박스 이름 "
+                f"{sorted(names)}과 다릅니다."
+            )
+        field = CAFE24_ESHIP_ORDER_FIELD
+    elif len(names) == 1:
+        field = next(iter(names))
+    else:
+        raise RuntimeError(
+            f"배송중 목록 체크박스에서 배송완료 요청 필드 이름을 정할 수 없습니다 ({sorted(names)}). "
+            f"CAFE24_ESHIP_ORDER_FIELD를 지정하세요."
+        )
+    return EshipRequest(urljoin(page_url, url), field)
+
+
+# Cafe24는 비밀번호를 오래 바꾸지 않으면 로그인 직후 비밀번호 변경 안내 화면을 보여준다.
+# 비밀번호 입력란이 없는 폼('다음에 변경하기')을 전송해 넘어가고, 그런 폼이 없으면 실패시킨다
+def skip_password_change(client, response):
+    parser = _FormParser()
+    parser.feed(response.text)
+    if not parser.password_change:
+        return response
+
+    later = next((form for form in parser.forms if not form['passwords']), None)
+    if later is None:
+        raise RuntimeError("Cafe24 비밀번호 변경 안내 화면을 넘길 수 없습니다. 관리자 화면에서 비밀번호를 변경하세요.")
+    log.warning("Cafe24 비밀번호 변경 안내 화면을 '다음에 변경하기'로 넘깁니다. 비밀번호를 변경하세요.")
+    return client.post(urljoin(response.url, later['action'] or response.url), later['fields'])
+
+
+# scrape_orders와 같은 [주문 목록, 배송완료 버튼] 형식으로 돌려준다.
+# check_element에는 체크박스 값이, 배송완료 버튼 자리에는 요청 주소와 필드 이름(EshipRequest)이 들어간다.
+@timed('cafe24_http.scrape_orders')
+def scrape_orders(client, shipping_order_page, wait=None):
+    page = {}
+
+    def fetch(limit):
+        page['response'] = client.get(with_page_limit(shipping_order_page, limit))
+        page['parser'] = ShippingListParser()
+        page['parser'].feed(page['response'].text)
+        return [row for row in page['parser'].rows if row['order_num_text'] is not None]
+
+    rows = read_all_pages(fetch)
+    response, parser = page['response'], page['parser']
+    log.info(f"주문수량: {len(rows)}")
+    if parser.empty or not rows:
+        log.info('검색된 주문내역이 없습니다.')
+        return [[], '']
+
+    eship_request = resolve_eship_request(response.url, parser)
+    order_list = []
+    for row in rows:
+        lines = row['order_num_text'].split('\n')
+        if len(lines) < 2:
+            continue
+        market_order_num = lines[1].split(' ')[0]
+        if not row['checkbox_id']:
+            log.debug('no chkbox', extra={'order_id': market_order_num})
+        order_list.append({
+            "market_order_num": market_order_num,
+            "scraped_order_num": normalize_market_order_num(market_order_num),
+            "checkbox_id": row['checkbox_id'],
+            "check_element": row['checkbox_id'],
+        })
+
+    log.info('배송중 주문목록 작성완료')
+    return [order_list, eship_request]
+
+
+# 재시작 후에는 목록을 다시 읽어 체크박스 값과 배송완료 요청 주소를 채운다
+def refresh_order_elements(client, wait, orders, shipping_order_page=default_mall.shipping_page):
+    fresh_orders, eship_request = scrape_orders(client, shipping_order_page)
+    values = {scraped_order_key(order): order['check_element'] for order in fresh_orders}
+    for order in orders:
+        order['check_element'] = values.get(scraped_order_key(order))
+    return eship_request
+
+
+# 체크박스 선택은 process_eship 요청에 함께 담기므로, 목록에서 체크박스 값을 찾은 주문만 골라낸다
+def select_order_checkboxes(client, orders, wait=None):
+    selected = {scraped_order_key(order) for order in orders if order.get('check_element')}
+    missing = {scraped_order_key(order) for order in orders} - selected
+    if missing:
+        log.warning(f"배송중 목록에서 찾을 수 없어 선택하지 못한 주문 {len(missing)}건: {sorted(missing)}")
+    return selected
+
+
+# 선택할 주문의 체크박스 값을 한 번의 요청으로 보내 배송완료 처리
+@timed('cafe24_http.process_eship')
+def process_eship(client, orders, order_element, alert=None, wait=None):
+    if not orders[0]:
+        return
+    if not order_element:
+        raise RuntimeError("배송완료 요청 주소를 찾을 수 없습니다. CAFE24_ESHIP_URL을 지정하세요.")
+
+    selected = [order['check_element'] for order in orders[1] if order.get('check_element')]
+    if not selected:
+        return
+    response = client.post(order_element.url, {order_element.field: selected})
+    log.info(f"배송완료 처리 요청 (HTTP): {len(selected)}건, 응답 {response.status_code}")
+
+    # 주소나 필드 이름이 틀려도 2xx가 올 수 있으므로 목록을 다시 읽어 실제로 빠졌는지 확인한다
+    remaining, _ = scrape_orders(client, client.mall.shipping_page)
+    still_listed = set(selected) & {order['check_element'] for order in remaining}
+    if still_listed:
+        raise RuntimeError(
+            f"배송완료 처리 요청 후에도 배송중 목록에 남아있는 주문 {len(still_listed)}건: {sorted(still_listed)} "
+            f"(CAFE24_ESHIP_URL/CAFE24_ESHIP_ORDER_FIELD를 확인하세요)"
+        )
@@ -0,0 +1,143 @@
+import time
+
+# 진입점 import에 걸린 시간을 healthcheck에서 보고한다.
+# 아래 import까지 재야 하므로 시작 시각을 import보다 먼저 잡는다 (E402 예외)
+_STARTED_AT = time.perf_counter()
+
+import os  # noqa: E402
+import sys  # noqa: E402
+import glob  # noqa: E402
+import json  # noqa: E402
+import asyncio  # noqa: E402
+import argparse  # noqa: E402
+import subprocess  # noqa: E402
+
+# .env 파일 로드 (다른 모듈이 설정 상수를 읽기 전에 한 번만)
+import config  # noqa: E402
+from mall_config import MALL_CONFIG_FILE, load_mall_configs  # noqa: E402
+
+
+# 명령별 import 시간 목표(초). healthcheck --startup이 새 프로세스에서 재서 넘으면 실패로 보고한다
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "0.5"))
+# 마지막 실행 요약이 이 시간(초)보다 오래되면 healthcheck 실패 (기본: 최대 실행 간격의 두 배)
+HEALTHCHECK_MAX_AGE = int(os.getenv("HEALTHCHECK_MAX_AGE", str(2 * int(os.getenv("SCHEDULE_MAX_INTERVAL", "3600")))))
+
+# 명령마다 처음 import하는 모듈. 무거운 의존성(selenium, gspread, pandas, telegram)은
+# 이 모듈들 안에서도 실제로 쓰는 함수가 호출될 때 import된다
+COMMAND_MODULES = {
+    'run-once': 'main',
+    'daemon': 'main',
+    'check-balance': 'automation_check',
+    'healthcheck': 'metrics',
+}
+
+
+def load_malls():
+    """설정은 여기서 한 번 읽어 각 명령에 넘긴다. 설정 파일이 없으면 None(환경 변수의 단일 몰)."""
+    return load_mall_configs(MALL_CONFIG_FILE) if MALL_CONFIG_FILE else None
+
+
+def measure_import_time(module):
+    """새 프로세스에서 module import에 걸린 시간(초). 이미 import된 모듈 캐시의 영향을 받지 않는다."""
+    code = (
+        "import time; started = time.perf_counter(); import config, {module}; "
+        "print(time.perf_counter() - started)"
+    ).format(module=module)
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, timeout=60
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} import 실패: {result.stderr.strip().splitlines()[-1:]}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def run_once(args, malls):
+    from main import run_once as run_pipeline_once
+
+    run_stats = asyncio.run(run_pipeline_once(malls))
+    print(json.dumps(run_stats, ensure_ascii=False, default=str))
+    return 1 if run_stats.get('failed') else 0
+
+
+def daemon(args, malls):
+    from main import run_daemon
+
+    run_daemon(malls)
+    return 0
+
+
+def check_balance(args, malls):
+    from automation_check import AsyncStoreAPI, default_mall
+
+    async def fetch():
+        balances = {}
+        for mall in malls or [default_mall]:
+            async with AsyncStoreAPI(mall.store_api_key) as store_api:
+                balances[mall.name or 'default'] = await store_api.get_balance()
+        return balances
+
+    print(json.dumps(asyncio.run(fetch()), ensure_ascii=False, indent=2))
+    return 0
+
+
+def healthcheck(args, malls):
+    from metrics import METRICS_DIR
+
+    report = {'status': 'ok', 'startup_seconds': round(time.perf_counter() - _STARTED_AT, 3)}
+    problems = []
+
+    # 실행마다(실패해도) 몰별 run_summary*.json이 갱신된다
+    now = time.time()
+    summaries = {
+        os.path.basename(path): round(now - os.path.getmtime(path))
+        for path in glob.glob(os.path.join(METRICS_DIR, 'run_summary*.json'))
+    }
+    report['last_run_age_seconds'] = summaries
+    problems += [f"{name}: 마지막 실행 {age}초 전" for name, age in summaries.items() if age > HEALTHCHECK_MAX_AGE]
+
+    if args.startup:
+        imports = {}
+        for module in sorted(set(COMMAND_MODULES.values())):
+            imports[module] = round(measure_import_time(module), 3)
+        report['import_seconds'] = imports
+        report['startup_budget'] = STARTUP_BUDGET
+        problems += [
+            f"{module} import {seconds}초 (목표 {STARTUP_BUDGET}초)"
+            for module, seconds in imports.items() if seconds > STARTUP_BUDGET
+        ]
+
+    if problems:
+        report['status'] = 'unhealthy'
+        report['problems'] = problems
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if problems else 0
+
+
+COMMANDS = {
+    'run-once': run_once,
+    'daemon': daemon,
+    'check-balance': check_balance,
+    'healthcheck': healthcheck,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='마켓 주문 자동 확인')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('run-once', help='한 번 실행하고 종료 (실패하면 종료 코드 1)')
+    subparsers.add_parser('daemon', help='스케줄러를 계속 실행')
+    subparsers.add_parser('check-balance', help='스토어 API 잔액 조회')
+    healthcheck_parser = subparsers.add_parser('healthcheck', help='마지막 실행 시각 확인 (문제가 있으면 종료 코드 1)')
+    healthcheck_parser.add_argument(
+        '--startup', action='store_true', help='명령별 import 시간을 새 프로세스에서 재서 STARTUP_BUDGET과 비교'
+    )
+    args = parser.parse_args(argv)
+
+    # healthcheck는 설정 파일을 읽지 않는다 (설정 오류가 있어도 상태 보고는 되도록)
+    malls = None if args.command == 'healthcheck' else load_malls()
+    return COMMANDS[args.command](args, malls)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
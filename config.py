@@ -0,0 +1,7 @@
+from dotenv import load_dotenv
+
+
+# .env 파일은 프로세스에서 한 번만 읽는다.
+# 모듈들이 import 시점에 환경 변수로 설정 상수를 만들므로, 진입점(cli.py, main.py)과
+# automation_check.py는 다른 모듈보다 먼저 이 모듈을 import한다.
+load_dotenv()
@@ -0,0 +1,137 @@
+import os
+import copy
+import json
+import queue
+import atexit
+import logging
+import contextvars
+
+import pytz
+
+from datetime import datetime, time
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
+
+
+LOGGER_NAME = 'market_automation_check'
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+# DEBUG로 지정하면 주문별 상세 로그까지 남긴다
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 'json' (한 줄에 JSON 하나) / 'text'
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# 레코드마다 시간대를 새로 만들지 않도록 한 번만 생성
+KST = pytz.timezone('Asia/Seoul')
+
+# 현재 실행의 run_id/mall. asyncio 태스크와 to_thread 스레드로 이어진다
+_log_context = contextvars.ContextVar('log_context', default={})
+
+
+def set_log_context(**values):
+    _log_context.set({**_log_context.get(), **values})
+
+
+def get_logger(module):
+    return logging.getLogger(f"{LOGGER_NAME}.{module}")
+
+
+class ContextFilter(logging.Filter):
+    """로그를 남기는 쪽 스레드에서 실행 컨텍스트(run_id, mall)를 레코드에 붙인다."""
+
+    def filter(self, record):
+        context = _log_context.get()
+        record.run_id = context.get('run_id')
+        record.mall = context.get('mall')
+        record.context = f"[{record.mall}] " if record.mall else ''
+        return True
+
+
+class KSTFormatter(logging.Formatter):
+    def converter(self, timestamp):
+        return datetime.fromtimestamp(timestamp, KST)
+
+    def formatTime(self, record, datefmt=None):
+        dt = self.converter(record.created)
+        if datefmt:
+            return dt.strftime(datefmt)
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class JsonFormatter(KSTFormatter):
+    FIELDS = ('run_id', 'mall', 'order_id')
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TracebackQueueHandler(QueueHandler):
+    """기본 QueueHandler.prepare는 traceback을 메시지에 합치고 exc_info를 지운다.
+    traceback은 exc_text로 따로 넘겨서 JSON 로그의 exception 필드에 남게 한다."""
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logger(name=LOGGER_NAME, level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """파일/콘솔 출력은 QueueListener 스레드에서 처리해 이벤트 루프가 I/O를 기다리지 않게 한다."""
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+    logger.setLevel(level)
+
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
+
+    # 파일 핸들러
+    log_file = os.path.join(LOG_DIR, f'{name}.log')
+    file_handler = TimedRotatingFileHandler(
+        log_file,
+        when='midnight',
+        interval=1,
+        backupCount=30,
+        encoding='utf-8',
+        atTime=time(hour=0, minute=0, second=0)
+    )
+    file_handler.suffix = "%Y-%m-%d"
+    console_handler = logging.StreamHandler()
+
+    # 파일/콘솔 모두 KST 기준 같은 포매터 사용
+    if log_format == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = KSTFormatter('%(asctime)s - %(levelname)s - %(context)s%(message)s')
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = TracebackQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    # 종료 시 큐에 남은 로그를 모두 기록
+    atexit.register(listener.stop)
+
+    logger.addHandler(queue_handler)
+    return logger
@@ -1,83 +1,252 @@
+# .env 파일 로드 (다른 모듈이 설정 상수를 읽기 전에 한 번만)
+import config
 import asyncio
-import logging
-import pytz
 import os
+import re
+import random
 
-from datetime import datetime, timezone, time
-from logging.handlers import TimedRotatingFileHandler
-from telegram import Bot
-from automation_check import main
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-class KSTFormatter(logging.Formatter):
-    def converter(self, timestamp):
-        dt = datetime.fromtimestamp(timestamp)
-        kst = pytz.timezone('Asia/Seoul')
-        return dt.replace(tzinfo=timezone.utc).astimezone(kst)
-
-    def formatTime(self, record, datefmt=None):
-        dt = self.converter(record.created)
-        if datefmt:
-            return dt.strftime(datefmt)
-        return dt.strftime('%Y-%m-%d %H:%M:%S')
-
-def setup_logger(name):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-
-    log_dir = 'logs'
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-
-    # 파일 핸들러
-    log_file = os.path.join(log_dir, f'{name}.log')
-    file_handler = TimedRotatingFileHandler(
-        log_file,
-        when='midnight',
-        interval=1,
-        backupCount=30,
-        encoding='utf-8',
-        atTime=time(hour=0, minute=0, second=0)
-    )
-    file_handler.suffix = "%Y-%m-%d"
-    
-    # KST 포매터 적용
-    kst_formatter = KSTFormatter(
-        '%(asctime)s - %(levelname)s - %(message)s'
-    )
-    file_handler.setFormatter(kst_formatter)
-    
-    # 콘솔 핸들러에도 동일한 KST 포매터 적용
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(kst_formatter)
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from automation_check import main, DriverManager, CAFE24_ENGINE
+from metrics import metrics, timed
+from mall_config import MALL_CONFIG_FILE, load_mall_configs
+from log_config import setup_logger, set_log_context, KST
+from archiver import run_archive, ARCHIVE_INTERVAL
 
 logger = setup_logger('market_automation_check')
 
-async def send_telegram_alert(error_message):
-    bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    
-    try:
-        bot = Bot(token=bot_token)  # telegram.Bot이 아닌 Bot으로 사용
-        await bot.send_message(
-            chat_id=chat_id,
-            text=f"🚨 에러 발생!\n{error_message}"
-        )
-    except Exception as e:
-        logger.error(f"Telegram 알림 전송 실패: {e}")
+# 텔레그램 메시지 최대 길이
+TELEGRAM_MESSAGE_LIMIT = 4096
+# 이 시간(초) 안에 같은 에러가 다시 나면 따로 보내지 않고 횟수만 모아서 보낸다
+ALERT_COALESCE_WINDOW = int(os.getenv("ALERT_COALESCE_WINDOW", "600"))
+# 텔레그램 전송 제한: 한 채팅에 초당 1건, 그룹은 분당 20건
+ALERT_MIN_INTERVAL = float(os.getenv("ALERT_MIN_INTERVAL", "1"))
+ALERT_MAX_PER_MINUTE = int(os.getenv("ALERT_MAX_PER_MINUTE", "20"))
+
+_ADDRESS_PATTERN = re.compile(r'0x[0-9a-fA-F]+')
+
+
+class SchedulePolicy:
+    """다음 실행까지 기다릴 시간을 실행 결과에 따라 정한다.
+
+    - 거의 완료된 주문이 많으면 min_interval로 당기고
+    - 처리할 주문이 없거나 스토어 API가 요청을 제한하면 max_interval로 늦춘다
+    - 실행에 걸린 시간을 빼서 실행 시각이 밀리지 않게 하고, jitter 비율만큼 흔든다
+    - 실패하면 failure_interval부터 두 배씩 늘려 max_interval까지 기다린다
+    """
+
+    def __init__(
+        self,
+        min_interval=int(os.getenv("SCHEDULE_MIN_INTERVAL", "600")),
+        max_interval=int(os.getenv("SCHEDULE_MAX_INTERVAL", "3600")),
+        base_interval=int(os.getenv("SCHEDULE_BASE_INTERVAL", "1800")),
+        failure_interval=int(os.getenv("SCHEDULE_FAILURE_INTERVAL", "60")),
+        near_complete_threshold=int(os.getenv("SCHEDULE_NEAR_COMPLETE_THRESHOLD", "5")),
+        jitter=float(os.getenv("SCHEDULE_JITTER", "0.1")),
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.base_interval = base_interval
+        self.failure_interval = failure_interval
+        self.near_complete_threshold = near_complete_threshold
+        self.jitter = jitter
+        self.failure_streak = 0
+
+    def next_interval(self, stats=None, run_duration=0, failed=False):
+        stats = stats or {}
+        if failed or stats.get('failed'):
+            self.failure_streak += 1
+            interval = min(self.failure_interval * 2 ** (self.failure_streak - 1), self.max_interval)
+            logger.info(f"[스케줄] 실패 {self.failure_streak}회 연속 → {interval:.0f}초 후 재실행")
+            return interval
+
+        self.failure_streak = 0
+        if stats.get('rate_limited'):
+            interval, reason = self.max_interval, f"스토어 API 요청 제한 {stats['rate_limited']}회"
+        elif not stats.get('scraped'):
+            interval, reason = self.max_interval, "배송중 주문 없음"
+        elif stats.get('near_complete', 0) >= self.near_complete_threshold:
+            interval, reason = self.min_interval, f"완료 임박 주문 {stats['near_complete']}건"
+        else:
+            interval, reason = self.base_interval, f"배송중 주문 {stats['scraped']}건"
+
+        interval -= run_duration
+        interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        logger.info(f"[스케줄] {reason}, 실행 {run_duration:.0f}초 소요 → {interval:.0f}초 후 실행")
+        return interval
+
+def truncate_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """텔레그램 길이 제한에 맞게 자른다. 에러 요약(앞)과 traceback 끝부분(뒤)을 남긴다."""
+    if len(text) <= limit:
+        return text
+    marker = "\n...(생략)...\n"
+    head = limit // 4
+    tail = limit - head - len(marker)
+    return text[:head] + marker + text[-tail:]
+
+
+class AlertService:
+    """텔레그램 알림을 큐에 넣고 백그라운드 태스크 하나에서 보낸다.
+
+    - Bot은 하나만 만들어 재사용한다
+    - 같은 에러(첫 줄 기준)는 처음 한 번만 바로 보내고, window 안에 다시 나면 횟수만 세었다가
+      window가 끝날 때 마지막 에러와 반복 횟수를 메시지 하나로 보낸다
+    - 텔레그램 전송 제한(채팅당 min_interval초에 1건, 분당 max_per_minute건)을 넘지 않게 기다린다
+    - send()는 큐에 넣기만 하므로 스케줄러 루프가 전송을 기다리지 않는다
+    """
+
+    def __init__(
+        self,
+        token=None,
+        chat_id=None,
+        window=ALERT_COALESCE_WINDOW,
+        min_interval=ALERT_MIN_INTERVAL,
+        max_per_minute=ALERT_MAX_PER_MINUTE,
+    ):
+        self.token = token or os.getenv("TELEGRAM_BOT_TOKEN")
+        self.chat_id = chat_id or os.getenv("TELEGRAM_CHAT_ID")
+        self.window = window
+        self.min_interval = min_interval
+        self.max_per_minute = max_per_minute
+        self.bot = None
+        self.queue = asyncio.Queue()
+        self.task = None
+        # 에러 첫 줄 -> {'first_at', 'count', 'message'}
+        self.repeats = {}
+        self.sent_at = deque()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._worker())
+        return self
+
+    async def send(self, error_message):
+        self.start()
+        self.queue.put_nowait(error_message)
+
+    async def close(self, timeout=30):
+        """큐에 남은 알림과 모아둔 반복 횟수를 보내고 종료한다."""
+        if self.task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Telegram 알림 {self.queue.qsize()}건을 보내지 못하고 종료합니다.")
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
+        try:
+            await asyncio.wait_for(self._flush_repeats(force=True), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("반복 에러 요약 알림을 보내지 못하고 종료합니다.")
+        if self.bot is not None:
+            await self.bot.shutdown()
+            self.bot = None
+
+    @staticmethod
+    def coalesce_key(message):
+        first_line = message.strip().split("\n", 1)[0]
+        # 객체 주소처럼 매번 달라지는 값은 같은 에러로 본다
+        return _ADDRESS_PATTERN.sub("0x", first_line)
+
+    async def _worker(self):
+        while True:
+            try:
+                message = await asyncio.wait_for(self.queue.get(), self._next_flush_delay())
+            except asyncio.TimeoutError:
+                await self._flush_repeats()
+                continue
+            try:
+                await self._handle(message)
+            except Exception as e:
+                logger.error(f"Telegram 알림 처리 실패: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _next_flush_delay(self):
+        pending = [repeat['first_at'] + self.window for repeat in self.repeats.values() if repeat['count']]
+        if not pending:
+            return None
+        return max(min(pending) - asyncio.get_running_loop().time(), 0)
+
+    async def _handle(self, message):
+        await self._flush_repeats()
+        key = self.coalesce_key(message)
+        repeat = self.repeats.get(key)
+        if repeat:
+            repeat['count'] += 1
+            repeat['message'] = message
+            return
+        self.repeats[key] = {'first_at': asyncio.get_running_loop().time(), 'count': 0, 'message': message}
+        await self._deliver(message)
+
+    async def _flush_repeats(self, force=False):
+        now = asyncio.get_running_loop().time()
+        for key, repeat in list(self.repeats.items()):
+            if not force and now - repeat['first_at'] < self.window:
+                continue
+            del self.repeats[key]
+            if repeat['count']:
+                elapsed = now - repeat['first_at']
+                await self._deliver(
+                    f"같은 에러가 {elapsed:.0f}초 동안 {repeat['count']}회 더 발생했습니다. 마지막 에러:\n{repeat['message']}"
+                )
+
+    async def _wait_for_rate_limit(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self.sent_at and now - self.sent_at[0] >= 60:
+                self.sent_at.popleft()
+            delay = self.sent_at[-1] + self.min_interval - now if self.sent_at else 0
+            if len(self.sent_at) >= self.max_per_minute:
+                delay = max(delay, self.sent_at[0] + 60 - now)
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        self.sent_at.append(loop.time())
+
+    @timed('telegram.send_message')
+    async def _deliver(self, error_message):
+        from telegram import Bot
+        from telegram.error import RetryAfter
+
+        if not self.token or not self.chat_id:
+            logger.error("Telegram 알림 전송 실패: TELEGRAM_BOT_TOKEN/TELEGRAM_CHAT_ID가 없습니다.")
+            return
+        if self.bot is None:
+            self.bot = Bot(token=self.token)
 
-async def run_with_retry(max_retries=3):
+        text = truncate_message(f"🚨 에러 발생!\n{error_message}")
+        metrics.record_payload('telegram.send_message', len(text.encode('utf-8')))
+        for attempt in range(2):
+            await self._wait_for_rate_limit()
+            try:
+                await self.bot.send_message(chat_id=self.chat_id, text=text)
+                return
+            except RetryAfter as e:
+                # 텔레그램이 요청을 제한하면 알려준 시간만큼 기다렸다가 한 번 더 보낸다
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"Telegram 전송 제한: {retry_after}초 후 재시도")
+                if attempt == 0:
+                    await asyncio.sleep(retry_after)
+            except Exception as e:
+                logger.error(f"Telegram 알림 전송 실패: {e}")
+                return
+        logger.error("Telegram 알림 전송 실패: 전송 제한이 풀리지 않았습니다.")
+
+
+alert_service = AlertService()
+
+async def run_with_retry(max_retries=3, driver_manager=None, run_stats=None):
     for attempt in range(max_retries):
         try:
-            return await main(logger=logger, send_alert=send_telegram_alert)
+            return await main(logger=logger, send_alert=alert_service.send, driver_manager=driver_manager, run_stats=run_stats)
         except Exception as e:
             logger.error(f"Attempt {attempt + 1}/{max_retries} failed: {e}")
             logger.exception("상세 에러:")
@@ -86,31 +255,128 @@ async def run_with_retry(max_retries=3):
             else:
                 raise
 
-async def scheduler():
-    kst = pytz.timezone('Asia/Seoul')
+async def archive_finished_orders(malls=None):
+    """오래된 완료 행 보관 이동. 시트 잠금으로 파이프라인과 겹치지 않으므로 실행과 별도로 진행한다."""
+    try:
+        results = await asyncio.to_thread(run_archive, malls)
+        logger.info(f"보관 이동 결과: {results}")
+    except Exception as e:
+        logger.exception(f"보관 이동 실패: {e}")
+        await alert_service.send(f"보관 이동 실패: {e}")
+
+def close_cafe24_sessions():
+    # HTTP 엔진의 몰별 Cafe24 세션은 실행 사이에 유지하다가 서비스를 끝낼 때 닫는다
+    if CAFE24_ENGINE == 'http':
+        from cafe24_http import close_sessions
+        close_sessions()
+
+async def run_once(malls=None):
+    """스케줄러 없이 한 번만 실행하고 실행 결과(run_stats)를 돌려준다."""
+    alert_service.start()
+    try:
+        if malls:
+            from multi_mall import MallRunner
+            mall_runner = MallRunner(malls)
+            try:
+                mall_stats, run_stats = await mall_runner.run_once(logger=logger, send_alert=alert_service.send)
+                logger.info(f"Mall results: {mall_stats}")
+            finally:
+                await mall_runner.close()
+                close_cafe24_sessions()
+            return run_stats
+
+        run_stats = {}
+        driver_manager = DriverManager()
+        try:
+            orders = await run_with_retry(max_retries=1, driver_manager=driver_manager, run_stats=run_stats)
+            logger.info(f"Processed orders: {len(orders)}")
+        finally:
+            driver_manager.quit()
+            close_cafe24_sessions()
+        return run_stats
+    finally:
+        await alert_service.close()
+
+async def archive_loop(malls=None):
+    # 실행 루프와 별도로 ARCHIVE_INTERVAL마다 보관 이동
     while True:
+        await archive_finished_orders(malls)
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+async def run_schedule(run, mall_name=None):
+    """run(run_stats)을 SchedulePolicy에 따라 반복한다.
+
+    다중 몰이면 몰마다 따로 돌려서, 한 몰의 실패로 늘어난 대기 시간이 다른 몰에 영향을 주지 않게 한다.
+    """
+    if mall_name:
+        set_log_context(mall=mall_name)
+    prefix = f"[{mall_name}] " if mall_name else ''
+    policy = SchedulePolicy()
+    while True:
+        run_stats = {}
+        run_start = asyncio.get_running_loop().time()
         try:
-            start_time = datetime.now(timezone.utc).astimezone(kst)
+            start_time = datetime.now(timezone.utc).astimezone(KST)
             logger.info(f"Starting execution at {start_time}")
-            
-            orders = await run_with_retry()
-            logger.info(f"Processed orders: {orders}")
-            
-            logger.info(f"Completed execution at {datetime.now(timezone.utc).astimezone(kst)}")
-            await asyncio.sleep(1800)
-            
+
+            await run(run_stats)
+
+            logger.info(f"Completed execution at {datetime.now(timezone.utc).astimezone(KST)}")
+            run_duration = asyncio.get_running_loop().time() - run_start
+            await asyncio.sleep(policy.next_interval(run_stats, run_duration))
+
         except Exception as e:
-            error_msg = f"Automation Check critical error occurred: {e}"
+            error_msg = f"{prefix}Automation Check critical error occurred: {e}"
             logger.error(error_msg)
             logger.exception("상세 에러:")
-            await send_telegram_alert(error_msg)
-            await asyncio.sleep(60)
+            await alert_service.send(error_msg)
+            await asyncio.sleep(policy.next_interval(failed=True))
 
-if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
+async def scheduler(malls=None):
+    # 설정 파일이 있으면 여러 몰을 한 프로세스에서 실행
+    mall_runner = None
+    if malls is None and MALL_CONFIG_FILE:
+        malls = load_mall_configs(MALL_CONFIG_FILE)
+    if malls:
+        from multi_mall import MallRunner
+        mall_runner = MallRunner(malls)
+        logger.info(f"다중 몰 실행: {[mall.name for mall in mall_runner.malls]}")
+    # 실행 사이에 Chrome과 Cafe24 세션을 유지
+    driver_manager = DriverManager() if mall_runner is None else None
+    alert_service.start()
+
+    def mall_run(mall):
+        async def run(run_stats):
+            run_stats.update(await mall_runner.run_mall(mall, logger, alert_service.send))
+            logger.info(f"Mall results: {run_stats}")
+        return run
+
+    async def single_run(run_stats):
+        orders = await run_with_retry(driver_manager=driver_manager, run_stats=run_stats)
+        logger.info(f"Processed orders: {len(orders)}")
+        logger.debug(f"Processed orders: {orders}")
+
+    loops = [archive_loop(malls)] if ARCHIVE_INTERVAL else []
+    if mall_runner:
+        loops += [run_schedule(mall_run(mall), mall.name) for mall in mall_runner.malls]
+    else:
+        loops.append(run_schedule(single_run))
+    try:
+        await asyncio.gather(*loops)
+    finally:
+        if mall_runner:
+            await mall_runner.close()
+        else:
+            driver_manager.quit()
+        close_cafe24_sessions()
+        await alert_service.close()
+
+def run_daemon(malls=None):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     try:
         logger.info("서비스 시작")
-        loop.run_until_complete(scheduler())
+        loop.run_until_complete(scheduler(malls))
     except KeyboardInterrupt:
         logger.info("Scheduler stopped by user")
     except Exception as e:
@@ -118,4 +384,7 @@ if __name__ == "__main__":
         logger.exception("상세 에러:")
     finally:
         logger.info("서비스 종료")
-        loop.close()
\ No newline at end of file
+        loop.close()
+
+if __name__ == "__main__":
+    run_daemon()
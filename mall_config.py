@@ -0,0 +1,75 @@
+import os
+import re
+import json
+
+
+# 여러 몰 설정 파일 경로. 지정하면 한 프로세스에서 모든 몰을 처리한다.
+MALL_CONFIG_FILE = os.getenv("MALL_CONFIG_FILE")
+
+# 몰 이름은 파일 이름에 들어가므로 영문/숫자/-/_만 허용
+_MALL_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class MallConfig:
+    """Cafe24 몰 한 곳의 로그인 정보, 페이지 주소, 시트/스토어 API/웹훅 설정.
+
+    name이 None이면 기존 단일 몰 환경 변수 설정이며, 몰별 파일(쿠키, 실행 기록,
+    상태 DB)은 기본 경로를 그대로 쓴다.
+    """
+
+    REQUIRED_FIELDS = (
+        'username', 'password', 'login_page', 'dashboard_page', 'shipping_page',
+        'sheet_key', 'store_api_key', 'make_hook_url',
+    )
+
+    def __init__(self, name, username, password, login_page, dashboard_page, shipping_page,
+                 sheet_key, store_api_key, make_hook_url):
+        self.name = name
+        self.username = username
+        self.password = password
+        self.login_page = login_page
+        self.dashboard_page = dashboard_page
+        self.shipping_page = shipping_page
+        self.sheet_key = sheet_key
+        self.store_api_key = store_api_key
+        self.make_hook_url = make_hook_url
+
+    @classmethod
+    def from_dict(cls, data):
+        name = data.get('name')
+        if not name or not _MALL_NAME_PATTERN.match(name):
+            raise ValueError(f"몰 이름이 올바르지 않습니다: {name!r}")
+        # 비밀번호/API 키는 ${ENV_NAME} 형식으로 환경 변수에서 읽을 수 있다
+        values = {
+            field: os.path.expandvars(data[field]) if isinstance(data.get(field), str) else data.get(field)
+            for field in cls.REQUIRED_FIELDS
+        }
+        missing = [field for field, value in values.items() if not value]
+        if missing:
+            raise ValueError(f"{name} 몰 설정에 값이 없습니다: {', '.join(missing)}")
+        return cls(name, **values)
+
+    # 몰별로 분리해야 하는 파일 경로 (예: run_journal.json -> run_journal-mall1.json)
+    def path_for(self, path):
+        if self.name is None:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}-{self.name}{ext}"
+
+    def __repr__(self):
+        return f"MallConfig({self.name or 'env'})"
+
+
+def load_mall_configs(path=MALL_CONFIG_FILE):
+    """{"malls": [{"name": ..., "username": ..., ...}, ...]} 형식의 JSON 설정 파일을 읽는다."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    malls = [MallConfig.from_dict(item) for item in data.get('malls', [])]
+    if not malls:
+        raise ValueError(f"설정 파일에 몰이 없습니다: {path}")
+    names = [mall.name for mall in malls]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"몰 이름이 중복되었습니다: {', '.join(duplicated)}")
+    return malls
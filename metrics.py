@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import asyncio
+import cProfile
+import functools
+import threading
+import contextvars
+
+from contextlib import contextmanager
+
+from log_config import get_logger
+
+
+# 실행 요약/프로메테우스 파일 위치 (기본: 앱 디렉토리/data/metrics)
+METRICS_DIR = os.getenv(
+    "METRICS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'metrics')
+)
+# node_exporter textfile collector가 읽을 파일
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE", os.path.join(METRICS_DIR, 'market_automation_check.prom'))
+# 한 번의 실행을 프로파일링: '' (사용 안 함) / 'cprofile' / 'pyinstrument'
+PROFILE_MODE = os.getenv("PROFILE_MODE", "").lower()
+
+_PROMETHEUS_PREFIX = 'market_automation'
+
+log = get_logger('metrics')
+
+
+class RunMetrics:
+    """실행 한 번 동안의 호출별 소요 시간, 호출/오류/재시도 횟수, 전송 크기를 모은다.
+
+    mall을 지정하면 요약/프로메테우스 파일이 몰별로 분리되고 몰 라벨이 붙는다.
+    """
+
+    def __init__(self, mall=None):
+        self.mall = mall
+        self.lock = threading.Lock()
+        self.reset()
+
+    def activate(self):
+        """현재 컨텍스트(asyncio 태스크와 그 태스크가 to_thread로 띄운 스레드)의 기록을 이 객체로 모은다."""
+        _active.set(self)
+        return self
+
+    def reset(self, run_id=None):
+        with self.lock:
+            self.run_id = run_id
+            self.started_at = time.time()
+            self.calls = {}
+
+    def _entry(self, name):
+        if name not in self.calls:
+            self.calls[name] = {
+                'count': 0,
+                'errors': 0,
+                'retries': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'payload_bytes': 0,
+            }
+        return self.calls[name]
+
+    def record(self, name, seconds, error=False):
+        with self.lock:
+            entry = self._entry(name)
+            entry['count'] += 1
+            entry['errors'] += int(error)
+            entry['total_seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+
+    def record_retry(self, name):
+        with self.lock:
+            self._entry(name)['retries'] += 1
+
+    def record_payload(self, name, size):
+        with self.lock:
+            self._entry(name)['payload_bytes'] += size
+
+    # backoff.on_exception(on_backoff=...)에 넘길 재시도 기록 함수
+    def backoff_handler(self, name):
+        return lambda details: self.record_retry(name)
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, error)
+
+    def timed(self, name):
+        """함수(동기/비동기) 호출 시간을 name으로 기록하는 데코레이터"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.measure(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.measure(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _path(self, path):
+        if self.mall is None:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}-{self.mall}{ext}"
+
+    def summary(self):
+        with self.lock:
+            return {
+                'mall': self.mall,
+                'run_id': self.run_id,
+                'started_at': self.started_at,
+                'duration_seconds': time.time() - self.started_at,
+                'calls': {name: dict(entry) for name, entry in sorted(self.calls.items())},
+            }
+
+    def write_summary(self, path=None):
+        summary = self.summary()
+        path = path or self._path(os.path.join(METRICS_DIR, 'run_summary.json'))
+        _write_atomic(path, json.dumps(summary, ensure_ascii=False, indent=2))
+        return summary
+
+    def write_prometheus(self, path=None):
+        path = path or self._path(PROMETHEUS_TEXTFILE)
+        summary = self.summary()
+        mall_label = f',mall="{self.mall}"' if self.mall else ''
+        series = (
+            ('call_count', 'count', 'Calls made during the last run'),
+            ('call_errors', 'errors', 'Calls that raised during the last run'),
+            ('call_retries', 'retries', 'Backoff retries during the last run'),
+            ('call_seconds', 'total_seconds', 'Total seconds spent per call during the last run'),
+            ('call_max_seconds', 'max_seconds', 'Slowest single call during the last run'),
+            ('call_payload_bytes', 'payload_bytes', 'Bytes sent/received per call during the last run'),
+        )
+        lines = []
+        for metric, key, help_text in series:
+            lines.append(f"# HELP {_PROMETHEUS_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {_PROMETHEUS_PREFIX}_{metric} gauge")
+            for name, entry in summary['calls'].items():
+                lines.append(f'{_PROMETHEUS_PREFIX}_{metric}{{call="{name}"{mall_label}}} {entry[key]}')
+        run_labels = f'{{mall="{self.mall}"}}' if self.mall else ''
+        lines.append(f"# TYPE {_PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{_PROMETHEUS_PREFIX}_last_run_timestamp_seconds{run_labels} {summary['started_at']}")
+        lines.append(f"# TYPE {_PROMETHEUS_PREFIX}_last_run_duration_seconds gauge")
+        lines.append(f"{_PROMETHEUS_PREFIX}_last_run_duration_seconds{run_labels} {summary['duration_seconds']}")
+        _write_atomic(path, '\n'.join(lines) + '\n')
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# 현재 컨텍스트에서 사용 중인 RunMetrics (없으면 프로세스 기본값)
+_active = contextvars.ContextVar('run_metrics', default=None)
+
+
+class _ActiveMetrics:
+    """호출 시점에 활성화된 RunMetrics로 기록을 넘긴다.
+
+    데코레이터는 import 시점에 만들어지므로 timed/backoff_handler는 여기서 정의해
+    실제 기록 대상을 호출할 때 고르게 한다.
+    """
+
+    def __init__(self, default):
+        self._default = default
+
+    def __getattr__(self, name):
+        return getattr(_active.get() or self._default, name)
+
+    timed = RunMetrics.timed
+    backoff_handler = RunMetrics.backoff_handler
+
+
+metrics = _ActiveMetrics(RunMetrics())
+timed = metrics.timed
+
+
+@contextmanager
+def profile_run(mode=PROFILE_MODE, output_dir=METRICS_DIR, run_id=None):
+    """mode에 따라 감싼 구간을 프로파일링하고 결과를 output_dir에 저장한다."""
+    if mode not in ('cprofile', 'pyinstrument'):
+        yield
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    name = f"profile-{run_id or int(time.time())}"
+
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            log.warning("pyinstrument가 설치되어 있지 않아 cProfile로 프로파일링합니다.")
+        else:
+            profiler = Profiler(async_mode='enabled')
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                path = os.path.join(output_dir, f"{name}.html")
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+                log.info(f"프로파일 저장: {path}")
+            return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(output_dir, f"{name}.prof")
+        profiler.dump_stats(path)
+        log.info(f"프로파일 저장: {path}")
@@ -0,0 +1,133 @@
+import os
+import asyncio
+
+from contextlib import asynccontextmanager
+
+from automation_check import (
+    main, DriverManager, authorize_sheets, create_store_client, CHROME_USER_DATA_DIR, CHROME_DEBUGGING_PORT,
+)
+from metrics import RunMetrics
+from log_config import set_log_context
+
+
+# 여러 몰이 함께 쓰는 Chrome 수. 몰 수보다 적으면 남는 몰은 브라우저가 반납될 때까지 기다린다.
+MALL_BROWSER_POOL_SIZE = int(os.getenv("MALL_BROWSER_POOL_SIZE", "2"))
+# 모든 몰이 공유하는 스토어 API 커넥션 수
+MALL_STORE_API_CONNECTIONS = int(os.getenv("MALL_STORE_API_CONNECTIONS", "10"))
+
+
+class DriverPool:
+    """몰 실행에 빌려주는 DriverManager 묶음.
+
+    가능하면 직전에 같은 몰로 로그인했던 브라우저를 돌려줘서 세션 전환을 줄인다.
+    """
+
+    def __init__(self, size=MALL_BROWSER_POOL_SIZE):
+        # 같은 프로필 디렉토리/디버깅 포트를 쓰면 두 번째 Chrome이 뜨지 않으므로 브라우저마다 나눈다
+        self.managers = [
+            DriverManager(
+                user_data_dir=f"{CHROME_USER_DATA_DIR}-{index}",
+                debugging_port=CHROME_DEBUGGING_PORT + index if CHROME_DEBUGGING_PORT else 0,
+            )
+            for index in range(max(size, 1))
+        ]
+        self.idle = list(self.managers)
+        self.condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def acquire(self, mall):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.idle)
+            manager = next(
+                (manager for manager in self.idle if manager.mall is not None and manager.mall.name == mall.name),
+                self.idle[0]
+            )
+            self.idle.remove(manager)
+        try:
+            yield manager
+        finally:
+            async with self.condition:
+                self.idle.append(manager)
+                self.condition.notify()
+
+    def quit(self):
+        for manager in self.managers:
+            manager.quit()
+
+
+class MallRunner:
+    """여러 몰을 한 프로세스에서 동시에 실행한다.
+
+    브라우저는 DriverPool로 개수를 제한하고, 스토어 API 커넥션 풀과 Google Sheets
+    클라이언트는 모든 몰이 공유한다. 몰마다 실행 기록/상태 DB/쿠키/지표를 따로 두고,
+    한 몰의 실패는 다른 몰 실행에 영향을 주지 않는다.
+    """
+
+    def __init__(self, malls, pool_size=MALL_BROWSER_POOL_SIZE):
+        self.malls = malls
+        self.pool = DriverPool(min(pool_size, len(malls)))
+        self.http_client = None
+        self.sheets_client = None
+        self.prepare_lock = asyncio.Lock()
+
+    async def run_mall(self, mall, logger=None, send_alert=None):
+        # 이 태스크(와 태스크가 띄운 스레드)의 지표와 로그는 몰별로 구분된다
+        RunMetrics(mall.name).activate()
+        set_log_context(mall=mall.name)
+
+        async def mall_alert(message):
+            if send_alert:
+                await send_alert(f"[{mall.name}] {message}")
+
+        await self.prepare()
+        run_stats = {}
+        async with self.pool.acquire(mall) as driver_manager:
+            await main(
+                logger=logger, send_alert=mall_alert, driver_manager=driver_manager, run_stats=run_stats,
+                mall=mall, http_client=self.http_client, sheets_client=self.sheets_client
+            )
+        return run_stats
+
+    async def prepare(self):
+        """모든 몰이 공유하는 스토어 API 커넥션 풀과 Google Sheets 클라이언트를 한 번만 만든다."""
+        async with self.prepare_lock:
+            if self.http_client is None:
+                self.http_client = create_store_client(MALL_STORE_API_CONNECTIONS)
+            if self.sheets_client is None:
+                self.sheets_client = await asyncio.to_thread(authorize_sheets)
+
+    async def run_once(self, logger=None, send_alert=None):
+        """모든 몰을 한 번씩 실행하고 몰별 실행 결과와 합친 결과를 돌려준다."""
+        await self.prepare()
+
+        results = await asyncio.gather(
+            *(self.run_mall(mall, logger, send_alert) for mall in self.malls),
+            return_exceptions=True
+        )
+
+        mall_stats = {}
+        for mall, result in zip(self.malls, results):
+            if isinstance(result, BaseException):
+                if logger:
+                    logger.error(f"[{mall.name}] 실행 실패: {result}")
+                result = {'failed': True}
+            mall_stats[mall.name] = result
+        return mall_stats, combine_stats(mall_stats.values())
+
+    async def close(self):
+        await asyncio.to_thread(self.pool.quit)
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+
+# 스케줄 결정용으로 몰별 실행 결과를 합친다 (한 몰이라도 실패하면 실패로 본다)
+def combine_stats(stats_list):
+    combined = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if key == 'failed':
+                combined['failed'] = combined.get('failed', False) or bool(value)
+            elif isinstance(value, (int, float)):
+                combined[key] = combined.get(key, 0) + value
+    return combined
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+
+from log_config import get_logger
+
+
+# 실행 단계 기록 파일 위치 (기본: 앱 디렉토리/data)
+RUN_JOURNAL_PATH = os.getenv(
+    "RUN_JOURNAL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'run_journal.json')
+)
+# 이 시간(초)보다 오래된 기록은 이어서 진행하지 않고 새로 시작
+RUN_JOURNAL_MAX_AGE = int(os.getenv("RUN_JOURNAL_MAX_AGE", "3600"))
+
+log = get_logger('run_journal')
+
+# 단계별 (최대 시도 횟수, 첫 재시도 대기 시간(초)). 대기 시간은 시도마다 두 배로 늘어난다.
+# 배송완료 버튼은 중복 처리 위험이 있어 재시도하지 않는다.
+STAGE_RETRY_BUDGETS = {
+    'login': (2, 10),
+    'scrape': (2, 5),
+    'sheet_snapshot': (3, 5),
+    'status_check': (2, 5),
+    'sheet_update': (3, 5),
+    'eship_click': (1, 0),
+    'manual': (2, 5),
+}
+
+
+class RunJournal:
+    """실행 단계별 결과를 디스크에 기록해서, 실패 후 재실행 시 끝난 단계는 건너뛴다.
+
+    결과는 JSON으로 저장할 수 있는 값이어야 하며, 모든 단계가 끝나면 finish()로 기록을 지운다.
+    """
+
+    def __init__(self, path=RUN_JOURNAL_PATH, max_age=RUN_JOURNAL_MAX_AGE):
+        self.path = path
+        self.data = self._load(max_age)
+        self.resumed = self.data is not None
+        if self.data is None:
+            self.data = {'run_id': uuid.uuid4().hex[:12], 'started_at': time.time(), 'stages': {}}
+
+    @property
+    def run_id(self):
+        return self.data['run_id']
+
+    @property
+    def completed_stages(self):
+        return list(self.data['stages'])
+
+    def _load(self, max_age):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"실행 기록 읽기 실패: {e}")
+            return None
+        if time.time() - data.get('started_at', 0) > max_age:
+            log.info(f"오래된 실행 기록({data.get('run_id')})은 사용하지 않습니다.")
+            return None
+        return data
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, stage):
+        return stage in self.data['stages']
+
+    def result(self, stage):
+        return self.data['stages'][stage]['result']
+
+    def complete(self, stage, result=None):
+        self.data['stages'][stage] = {'result': result, 'completed_at': time.time()}
+        self._save()
+
+    def finish(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def run_stage(self, stage, func, encode=None, decode=None, checkpoint=True, logger=None):
+        """stage가 이미 끝났으면 기록된 결과를, 아니면 func()를 재시도 한도 안에서 실행한 결과를 돌려준다.
+
+        func는 호출할 때마다 새 코루틴을 만드는 함수여야 한다.
+        encode/decode는 결과를 JSON 값으로 바꾸거나 되돌릴 때 사용한다.
+        """
+        if checkpoint and self.is_done(stage):
+            _log(logger, f"[단계] {stage}: 이전 실행 결과 사용")
+            result = self.result(stage)
+            return decode(result) if decode else result
+
+        max_tries, delay = STAGE_RETRY_BUDGETS.get(stage, (1, 0))
+        for attempt in range(1, max_tries + 1):
+            try:
+                result = await func()
+                break
+            except Exception as e:
+                if attempt == max_tries:
+                    raise
+                wait = delay * 2 ** (attempt - 1)
+                _log(logger, f"[단계] {stage} 실패 ({attempt}/{max_tries}), {wait}초 후 재시도: {e}")
+                await asyncio.sleep(wait)
+
+        if checkpoint:
+            self.complete(stage, encode(result) if encode else result)
+        return result
+
+
+def _log(logger, message):
+    (logger or log).info(message)
@@ -0,0 +1,278 @@
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import threading
+import contextvars
+
+from log_config import get_logger
+
+
+# 실행 기록(trace) 저장 위치 (기본: 앱 디렉토리/data/traces)
+TRACE_DIR = os.getenv(
+    "TRACE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'traces')
+)
+# true면 실행마다 크롤링 결과, 시트 스냅샷, 스토어 API 요청/응답, 웹훅 내용을 기록
+TRACE_RECORD = os.getenv("TRACE_RECORD", "false").lower() == "true"
+
+# 기록하지 않는 요청 파라미터
+_SECRET_PARAMS = ('key',)
+
+log = get_logger('run_trace')
+
+
+class TraceRecorder:
+    """실행 한 번의 외부 입출력을 gzip JSON 파일 하나로 기록한다. API 키와 웹훅 주소는 남기지 않는다."""
+
+    def __init__(self, path, run_id=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.trace = {
+            'run_id': run_id,
+            'recorded_at': time.time(),
+            'scraped_orders': [],
+            'sheets': {},
+            'store_api': [],
+            # check_order가 실제로 사용한 스토어주문 상태 (상태 캐시에서 읽은 값 포함)
+            'statuses': {},
+            # state_store 판단: 확인 대상(due), 배송완료 처리가 남은 주문(eship_pending), 시트 표시 이력(sheet_marked)
+            'state': {},
+            'webhooks': [],
+        }
+
+    def record_scraped(self, orders):
+        with self.lock:
+            self.trace['scraped_orders'] = [
+                {key: value for key, value in order.items() if key != 'check_element'} for order in orders
+            ]
+
+    def record_sheet(self, sheet_name, values):
+        with self.lock:
+            self.trace['sheets'][sheet_name] = values
+
+    def record_store_api(self, params, status_code, body, elapsed):
+        with self.lock:
+            self.trace['store_api'].append({
+                'params': {key: value for key, value in params.items() if key not in _SECRET_PARAMS},
+                'status_code': status_code,
+                'body': body,
+                'elapsed': round(elapsed, 4),
+            })
+
+    def record_statuses(self, statuses):
+        with self.lock:
+            self.trace['statuses'].update({str(order_id): result for order_id, result in statuses.items()})
+
+    def record_state(self, name, market_order_nums):
+        with self.lock:
+            self.trace['state'][name] = sorted(market_order_nums)
+
+    def record_webhook(self, payload):
+        with self.lock:
+            self.trace['webhooks'].append(payload)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            data = json.dumps(self.trace, ensure_ascii=False, separators=(',', ':'), default=str)
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            f.write(data)
+        log.info(f"실행 기록 저장: {self.path}")
+
+
+# 몰별 실행이 한 프로세스에서 동시에 돌 수 있으므로 기록기는 실행(컨텍스트)마다 따로 둔다
+_recorder = contextvars.ContextVar('trace_recorder', default=None)
+
+
+def start_recording(run_id, mall=None):
+    name = f"trace-{mall}-{run_id}" if mall else f"trace-{run_id}"
+    recorder = TraceRecorder(os.path.join(TRACE_DIR, f"{name}.json.gz"), run_id)
+    _recorder.set(recorder)
+    return recorder
+
+
+def stop_recording():
+    recorder = _recorder.get()
+    _recorder.set(None)
+    if recorder:
+        recorder.save()
+
+
+def is_recording():
+    return _recorder.get() is not None
+
+
+def record_scraped(orders):
+    recorder = _recorder.get()
+    if recorder:
+        recorder.record_scraped(orders)
+
+
+def record_sheet(sheet_name, values):
+    recorder = _recorder.get()
+    if recorder:
+        recorder.record_sheet(sheet_name, values)
+
+
+def record_store_api(params, status_code, body, elapsed):
+    recorder = _recorder.get()
+    if recorder:
+        recorder.record_store_api(params, status_code, body, elapsed)
+
+
+def record_statuses(statuses):
+    recorder = _recorder.get()
+    if recorder:
+        recorder.record_statuses(statuses)
+
+
+def record_state(name, market_order_nums):
+    recorder = _recorder.get()
+    if recorder:
+        recorder.record_state(name, market_order_nums)
+
+
+def record_webhook(payload):
+    recorder = _recorder.get()
+    if recorder:
+        recorder.record_webhook(payload)
+
+
+def load_trace(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ReplayStoreAPI:
+    """기록된 스토어 API 응답으로 주문 상태를 돌려준다. with_latency면 기록된 응답 시간만큼 기다린다.
+
+    statuses(check_order가 실제로 사용한 상태)가 있으면 그 값을 우선한다. 상태 캐시에서 읽어
+    API를 호출하지 않은 주문도 기록된 실행과 같은 상태를 돌려주기 위해서다.
+    """
+
+    def __init__(self, exchanges, with_latency=False, statuses=None):
+        self.with_latency = with_latency
+        self.calls = 0
+        self.statuses = {}
+        self.latencies = []
+        for exchange in exchanges:
+            params, body = exchange['params'], exchange['body']
+            if params.get('action') != 'status' or not isinstance(body, dict):
+                continue
+            self.latencies.append(exchange['elapsed'])
+            if 'orders' in params:
+                self.statuses.update(body)
+            elif 'order' in params:
+                self.statuses[str(params['order'])] = body
+        self.statuses.update(statuses or {})
+
+    async def get_multiple_order_status(self, order_ids):
+        if self.with_latency and self.latencies:
+            await asyncio.sleep(self.latencies[self.calls % len(self.latencies)])
+        self.calls += 1
+        return {
+            str(order_id): self.statuses.get(str(order_id), {'error': '기록에 없는 주문입니다.'})
+            for order_id in order_ids
+        }
+
+
+class ReplayStateStore:
+    """기록된 state_store 판단을 그대로 돌려주는 OrderStateStore 대역. 기록은 하지 않는다."""
+
+    def __init__(self, state):
+        self.state = {name: set(market_order_nums) for name, market_order_nums in state.items()}
+
+    def record_scraped(self, market_order_nums):
+        pass
+
+    def due_orders(self, market_order_nums):
+        return set(market_order_nums) & self.state.get('due', set())
+
+    def with_pending_action(self, market_order_nums, done_action, pending_action):
+        return set(market_order_nums) & self.state.get('eship_pending', set())
+
+    def with_action(self, market_order_nums, action):
+        return set(market_order_nums) & self.state.get(action, set())
+
+    def link_store_orders(self, market_order_num, store_order_ids):
+        pass
+
+    def schedule_recheck(self, market_order_num, delay=None):
+        pass
+
+    def mark_action(self, market_order_nums, action, detail=''):
+        pass
+
+
+def replay(path, with_latency=False):
+    """기록된 실행을 외부 서비스 없이 check_order → process_orders → 수동주문 처리 순서로 다시 실행한다."""
+    import automation_check as ac
+    from bench.fakes import InMemoryWorksheet, FakeSheetManager
+
+    trace = load_trace(path)
+    shipping = InMemoryWorksheet('market_store_order_list', trace['sheets']['market_store_order_list'])
+    manual = InMemoryWorksheet('manual_order_list', trace['sheets'].get('manual_order_list') or [[]])
+    sheet_manager = FakeSheetManager([shipping, manual])
+    store_api = ReplayStoreAPI(trace['store_api'], with_latency, trace.get('statuses'))
+    # state_store 판단이 기록되지 않은 예전 기록은 모든 주문을 확인한다
+    state_store = ReplayStateStore(trace['state']) if trace.get('state') else None
+    orders = [dict(order, check_element=None) for order in trace['scraped_orders']]
+    webhooks = []
+
+    class ReplayDispatcher(ac.ManualOrderDispatcher):
+        def _post(self, payload):
+            webhooks.append(payload)
+            return True
+
+    timings = {}
+    start = time.perf_counter()
+    shipping_order_data = ac.get_shipping_order_data(sheet_manager)
+    timings['sheet_snapshot'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    processed_orders, manual_orders = asyncio.run(
+        ac.check_order(orders, shipping_order_data, store_api, state_store=state_store))
+    timings['check_order'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ac.process_orders(sheet_manager, processed_orders, state_store)
+    timings['process_orders'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if manual_orders:
+        ac.add_manual_order_sheets(manual, manual_orders)
+        ac.alert_manual_orders(None, sheet_manager, manual_orders, dispatcher=ReplayDispatcher(None))
+    timings['manual_orders'] = time.perf_counter() - start
+
+    return {
+        'run_id': trace.get('run_id'),
+        'scraped_orders': len(orders),
+        'processed_orders': len(processed_orders),
+        'manual_orders': len(manual_orders),
+        'store_api_calls': {'recorded': len(trace['store_api']), 'replayed': store_api.calls},
+        'webhooks': {'recorded': len(trace['webhooks']), 'replayed': len(webhooks)},
+        'sheet_calls': dict(sheet_manager.calls),
+        'seconds': {name: round(value, 4) for name, value in timings.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='기록된 실행(trace) 다시 실행')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replay_parser = subparsers.add_parser('replay')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--with-latency', action='store_true', help='기록된 스토어 API 응답 시간만큼 대기')
+    args = parser.parse_args(argv)
+
+    result = replay(args.path, args.with_latency)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
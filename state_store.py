@@ -0,0 +1,262 @@
+import os
+import time
+import fcntl
+import sqlite3
+import threading
+
+from contextlib import contextmanager
+
+
+# 로컬 상태 DB 위치 (기본: 앱 디렉토리/data)
+STATE_DB_PATH = os.getenv(
+    "STATE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'automation_state.sqlite3')
+)
+# 다시 조회할 필요가 없는 스토어 주문 상태
+TERMINAL_STATUSES = ('Completed', 'Partial', 'Canceled')
+# 진행중 상태를 캐시에서 재사용하는 시간(초)
+STATUS_CACHE_TTL = int(os.getenv("STATUS_CACHE_TTL", "600"))
+# 완료되지 않은 마켓주문을 다시 확인하기까지의 시간(초)
+ORDER_RECHECK_INTERVAL = int(os.getenv("ORDER_RECHECK_INTERVAL", "1500"))
+# 일부 스토어주문만 완료된 마켓주문은 더 자주 확인한다. 스케줄러가 완료 임박 주문이 많을 때
+# 앞당기는 간격(SCHEDULE_MIN_INTERVAL)과 같게 해서 앞당긴 실행에서 바로 다시 확인되게 한다
+NEAR_COMPLETE_RECHECK_INTERVAL = int(os.getenv(
+    "NEAR_COMPLETE_RECHECK_INTERVAL", os.getenv("SCHEDULE_MIN_INTERVAL", "600")
+))
+# 더 이상 크롤링되지 않는 주문 기록 보관 기간(일)
+STATE_RETENTION_DAYS = int(os.getenv("STATE_RETENTION_DAYS", "30"))
+
+# market_store_order_list의 행 번호로 쓰거나 지우는 작업(시트 업데이트, 보관 이동)이 겹치지 않게 하는 잠금 파일
+SHEET_LOCK_PATH = os.getenv(
+    "SHEET_LOCK_PATH", os.path.join(os.path.dirname(STATE_DB_PATH), 'market_store_order_list.lock')
+)
+# 잠금을 기다리는 최대 시간(초)
+SHEET_LOCK_TIMEOUT = float(os.getenv("SHEET_LOCK_TIMEOUT", "300"))
+
+# SQLite 한 쿼리에 넣을 최대 파라미터 수
+_QUERY_CHUNK_SIZE = 500
+
+
+def connect(path=STATE_DB_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 시트/브라우저 단계가 스레드에서 실행되므로 연결을 스레드 간에 공유한다
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+@contextmanager
+def sheet_lock(path=SHEET_LOCK_PATH, timeout=SHEET_LOCK_TIMEOUT):
+    """파일 잠금(flock). 다른 프로세스(보관 이동 CLI 등)나 다른 스레드와도 배타적으로 동작한다."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    with open(path, 'a') as f:
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"시트 잠금을 {timeout:.0f}초 안에 얻지 못했습니다: {path}")
+                time.sleep(0.5)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class StatusCache:
+    """스토어주문번호 -> 마지막 상태/조회 시각 캐시.
+
+    종료 상태(TERMINAL_STATUSES)는 다시 조회하지 않고,
+    그 외 상태는 ttl 초 동안만 재사용한다.
+    """
+
+    def __init__(self, path=STATE_DB_PATH, ttl=STATUS_CACHE_TTL):
+        self.ttl = ttl
+        self.conn = connect(path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS store_order_status (
+                order_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def get_fresh(self, order_ids):
+        order_ids = [str(order_id) for order_id in order_ids]
+        expire_before = time.time() - self.ttl
+        statuses = {}
+
+        for i in range(0, len(order_ids), _QUERY_CHUNK_SIZE):
+            chunk = order_ids[i:i + _QUERY_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT order_id, status, checked_at FROM store_order_status WHERE order_id IN ({placeholders})',
+                chunk
+            )
+            for order_id, status, checked_at in rows:
+                if status in TERMINAL_STATUSES or checked_at >= expire_before:
+                    statuses[order_id] = {'status': status}
+        return statuses
+
+    def put(self, statuses):
+        now = time.time()
+        rows = [
+            (str(order_id), result['status'], now)
+            for order_id, result in statuses.items()
+            if result.get('status') and 'error' not in result
+        ]
+        self.conn.executemany('''
+            INSERT INTO store_order_status (order_id, status, checked_at) VALUES (?, ?, ?)
+            ON CONFLICT(order_id) DO UPDATE SET status = excluded.status, checked_at = excluded.checked_at
+        ''', rows)
+        self.conn.commit()
+
+    def prune(self, days=STATE_RETENTION_DAYS):
+        # 종료 상태도 오래 조회되지 않은 주문은 지운다 (보관 이동된 주문이 계속 쌓이지 않도록)
+        expire_before = time.time() - days * 24 * 60 * 60
+        self.conn.execute('DELETE FROM store_order_status WHERE checked_at < ?', (expire_before,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class OrderStateStore:
+    """마켓주문별 처리 이력.
+
+    크롤링 시각, 연결된 스토어주문, 다음 확인 예정 시각, 이미 수행한 작업
+    (시트 배송완료 표시, 배송완료 버튼 처리, 수동주문 알림)을 기록해서
+    매 실행마다 새로 생겼거나 확인 시점이 된 주문만 처리할 수 있게 한다.
+    """
+
+    ACTIONS = ('sheet_marked', 'eship_clicked', 'alert_sent')
+
+    def __init__(self, path=STATE_DB_PATH, recheck_interval=ORDER_RECHECK_INTERVAL):
+        self.recheck_interval = recheck_interval
+        self.conn = connect(path)
+        self.lock = threading.Lock()
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS market_orders (
+                market_order_num TEXT PRIMARY KEY,
+                first_seen_at REAL NOT NULL,
+                last_scraped_at REAL NOT NULL,
+                next_check_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS market_store_orders (
+                market_order_num TEXT NOT NULL,
+                store_order_id TEXT NOT NULL,
+                PRIMARY KEY (market_order_num, store_order_id)
+            );
+            CREATE TABLE IF NOT EXISTS order_actions (
+                market_order_num TEXT NOT NULL,
+                action TEXT NOT NULL,
+                detail TEXT NOT NULL DEFAULT '',
+                taken_at REAL NOT NULL,
+                PRIMARY KEY (market_order_num, action, detail)
+            );
+        ''')
+        self.conn.commit()
+
+    def _select_in(self, query, values, *params):
+        values = list(values)
+        rows = []
+        for i in range(0, len(values), _QUERY_CHUNK_SIZE):
+            chunk = values[i:i + _QUERY_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows.extend(self.conn.execute(query.format(placeholders=placeholders), [*params, *chunk]))
+        return rows
+
+    def record_scraped(self, market_order_nums):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany('''
+                INSERT INTO market_orders (market_order_num, first_seen_at, last_scraped_at) VALUES (?, ?, ?)
+                ON CONFLICT(market_order_num) DO UPDATE SET last_scraped_at = excluded.last_scraped_at
+            ''', [(num, now, now) for num in market_order_nums])
+            self.conn.commit()
+
+    # 새 주문이거나 다시 확인할 시점이 된 주문
+    def due_orders(self, market_order_nums):
+        now = time.time()
+        with self.lock:
+            rows = self._select_in(
+                'SELECT market_order_num FROM market_orders '
+                'WHERE next_check_at > ? AND market_order_num IN ({placeholders})',
+                market_order_nums, now
+            )
+        waiting = {num for num, in rows}
+        return {num for num in market_order_nums if num not in waiting}
+
+    def link_store_orders(self, market_order_num, store_order_ids):
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO market_store_orders (market_order_num, store_order_id) VALUES (?, ?)',
+                [(market_order_num, str(store_order_id)) for store_order_id in store_order_ids]
+            )
+            self.conn.commit()
+
+    def schedule_recheck(self, market_order_num, delay=None):
+        delay = self.recheck_interval if delay is None else delay
+        with self.lock:
+            self.conn.execute(
+                'UPDATE market_orders SET next_check_at = ? WHERE market_order_num = ?',
+                (time.time() + delay, market_order_num)
+            )
+            self.conn.commit()
+
+    def mark_action(self, market_order_nums, action, detail=''):
+        if action not in self.ACTIONS:
+            raise ValueError(f"알 수 없는 작업: {action}")
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO order_actions (market_order_num, action, detail, taken_at) VALUES (?, ?, ?, ?)',
+                [(num, action, detail, now) for num in market_order_nums]
+            )
+            self.conn.commit()
+
+    def has_action(self, market_order_num, action, detail=''):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM order_actions WHERE market_order_num = ? AND action = ? AND detail = ?',
+                (market_order_num, action, detail)
+            ).fetchone()
+        return row is not None
+
+    # 주어진 주문 중 해당 작업을 이미 수행한 주문
+    def with_action(self, market_order_nums, action):
+        with self.lock:
+            rows = self._select_in(
+                'SELECT DISTINCT market_order_num FROM order_actions '
+                'WHERE action = ? AND market_order_num IN ({placeholders})',
+                market_order_nums, action
+            )
+        return {num for num, in rows}
+
+    # 주어진 주문 중 done_action은 끝났지만 pending_action은 아직인 주문
+    # (예: 시트는 배송완료로 바꿨는데 배송완료 버튼 처리가 실패한 주문)
+    def with_pending_action(self, market_order_nums, done_action, pending_action):
+        market_order_nums = list(market_order_nums)
+        return (self.with_action(market_order_nums, done_action) -
+                self.with_action(market_order_nums, pending_action))
+
+    # 보관 기간 동안 크롤링되지 않은(배송완료 처리가 끝난) 주문 기록 삭제
+    def prune(self, days=STATE_RETENTION_DAYS):
+        expire_before = time.time() - days * 24 * 60 * 60
+        with self.lock:
+            self.conn.executescript(f'''
+                DELETE FROM market_store_orders WHERE market_order_num IN (
+                    SELECT market_order_num FROM market_orders WHERE last_scraped_at < {expire_before});
+                DELETE FROM order_actions WHERE market_order_num IN (
+                    SELECT market_order_num FROM market_orders WHERE last_scraped_at < {expire_before});
+                DELETE FROM market_orders WHERE last_scraped_at < {expire_before};
+            ''')
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
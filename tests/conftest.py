@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# 실행 기록/상태 DB/지표/쿠키/로그 파일을 저장소 대신 임시 디렉토리에 쓴다.
+# 모듈이 import될 때 경로 상수를 읽으므로 다른 모듈을 import하기 전에 지정한다
+_DATA_DIR = tempfile.mkdtemp(prefix='market-automation-test-')
+for _name, _filename in {
+    'STATE_DB_PATH': 'automation_state.sqlite3',
+    'RUN_JOURNAL_PATH': 'run_journal.json',
+    'METRICS_DIR': 'metrics',
+    'CAFE24_COOKIE_FILE': 'cafe24_cookies.json',
+    'LOG_DIR': 'logs',
+}.items():
+    os.environ[_name] = os.path.join(_DATA_DIR, _filename)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import automation_check as ac  # noqa: E402
+import cafe24_http  # noqa: E402
+from mall_config import MallConfig  # noqa: E402
+from bench.fakes import FakeServer, FakeSheetManager, build_sheets  # noqa: E402
+
+
+@pytest.fixture
+def fake_server():
+    # 스토어 주문은 모두 완료 상태로 응답한다
+    with FakeServer(status_mix={'Completed': 1}) as server:
+        yield server
+
+
+@pytest.fixture
+def admin_mall(request, fake_server):
+    """가짜 Cafe24 관리자에 로그인하는 몰. 몰 이름을 테스트마다 달리해서 쿠키/실행 기록/상태 DB가 섞이지 않게 한다."""
+    base_url = fake_server.base_url
+    yield MallConfig(
+        request.node.name.replace('[', '-').replace(']', ''), 'bench', 'bench-password',
+        f"{base_url}/admin/login", f"{base_url}/admin/dashboard", f"{base_url}/admin/shipping",
+        'sheet-key', 'store-key', f"{base_url}/hook"
+    )
+    cafe24_http.close_sessions()
+
+
+@pytest.fixture
+def http_pipeline(admin_mall, fake_server, monkeypatch):
+    """가짜 Cafe24 관리자/스토어 API/시트로 HTTP 엔진 파이프라인(automation_check.main)을 실행할 준비.
+
+    (mall, sheet_manager)를 돌려준다.
+    """
+    base_url = fake_server.base_url
+    mall = admin_mall
+    shipping, manual, _ = build_sheets(fake_server.admin_rows, fake_server.admin_rows)
+    sheet_manager = FakeSheetManager([shipping, manual])
+
+    monkeypatch.setattr(ac, 'store_basic_url', f"{base_url}/api")
+    monkeypatch.setattr(ac, 'load_cafe24_engine', lambda: cafe24_http)
+    monkeypatch.setattr(ac, 'connect_sheets', lambda mall, gc=None: (sheet_manager, shipping, manual))
+    return mall, sheet_manager
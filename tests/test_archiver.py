@@ -0,0 +1,34 @@
+from datetime import date
+
+import pytest
+
+import archiver
+from test_check_order import order_row, make_sheet_manager
+
+
+def _sheet_manager():
+    return make_sheet_manager([
+        order_row('20240101-0000001', '1', '배송완료'),
+        order_row('20240101-0000002', '2', '배송중'),
+    ])
+
+
+def test_archive_moves_old_finished_rows(tmp_path):
+    sheet_manager = _sheet_manager()
+    moved = archiver.archive_orders(sheet_manager, days=30, lock_path=str(tmp_path / 'sheet.lock'),
+                                    today=date(2024, 3, 1))
+    assert moved == 1
+    shipping = sheet_manager.get_worksheet('market_store_order_list').get_all_values()
+    assert [row[0] for row in shipping[1:]] == ['20240101-0000002']
+
+
+# 날짜 열 설정이 시트와 맞지 않으면 아무 행도 지우지 않고 실패한다
+@pytest.mark.parametrize('date_column', ['주문일', '비고'])
+def test_archive_fails_before_deleting_with_wrong_date_column(tmp_path, date_column):
+    sheet_manager = _sheet_manager()
+    before = sheet_manager.get_worksheet('market_store_order_list').get_all_values()
+
+    with pytest.raises(ValueError, match=date_column):
+        archiver.archive_orders(sheet_manager, days=30, lock_path=str(tmp_path / 'sheet.lock'),
+                                today=date(2024, 3, 1), date_column=date_column)
+    assert sheet_manager.get_worksheet('market_store_order_list').get_all_values() == before
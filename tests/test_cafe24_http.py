@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+import automation_check as ac
+import cafe24_http
+
+
+def open_client(mall, tmp_path):
+    return cafe24_http.Cafe24HttpClient(mall, cookie_file=str(tmp_path / 'cookies.json')).ensure_login()
+
+
+def test_login_scrape_and_eship(admin_mall, fake_server, tmp_path):
+    client = open_client(admin_mall, tmp_path)
+    assert fake_server.counters['admin.login_submit'] == 1
+
+    orders, eship_request = cafe24_http.scrape_orders(client, admin_mall.shipping_page)
+    assert [order['check_element'] for order in orders] == [f"chk-{i}" for i in range(fake_server.admin_rows)]
+    assert eship_request == (f"{fake_server.base_url}/admin/shipping/complete", 'order_id[]')
+
+    cafe24_http.process_eship(client, [True, orders[:3]], eship_request)
+    assert fake_server.shipped_ids == ['chk-0', 'chk-1', 'chk-2']
+    remaining, _ = cafe24_http.scrape_orders(client, admin_mall.shipping_page)
+    assert len(remaining) == fake_server.admin_rows - 3
+    client.close()
+
+
+# 저장된 쿠키로 세션을 복원하면 다시 로그인하지 않는다
+def test_session_restored_from_cookies(admin_mall, fake_server, tmp_path):
+    open_client(admin_mall, tmp_path).close()
+    client = open_client(admin_mall, tmp_path)
+    assert fake_server.counters['admin.login_submit'] == 1
+    client.close()
+
+
+def test_password_change_notice_is_skipped(admin_mall, fake_server, tmp_path):
+    fake_server.admin_password_change = 'optional'
+    client = open_client(admin_mall, tmp_path)
+    assert fake_server.counters['admin.password_later'] == 1
+
+    orders, _ = cafe24_http.scrape_orders(client, admin_mall.shipping_page)
+    assert len(orders) == fake_server.admin_rows
+    client.close()
+
+
+def test_required_password_change_fails_login(admin_mall, fake_server, tmp_path):
+    fake_server.admin_password_change = 'required'
+    with pytest.raises(RuntimeError, match='비밀번호 변경'):
+        open_client(admin_mall, tmp_path)
+
+
+# DriverManager 없이 실행하면 실행이 끝날 때 Cafe24 세션을 닫는다
+def test_one_shot_run_closes_session(http_pipeline):
+    mall, _ = http_pipeline
+    run_stats = {}
+    asyncio.run(ac.main(run_stats=run_stats, mall=mall))
+    assert not run_stats.get('failed')
+    assert mall.name not in cafe24_http._clients
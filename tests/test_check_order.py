@@ -0,0 +1,65 @@
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import automation_check as ac
+from state_store import OrderStateStore
+from bench.fakes import FakeSheetManager, InMemoryWorksheet, SHIPPING_ORDER_HEADER, MANUAL_ORDER_HEADER
+
+
+class FakeStoreAPI:
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    async def get_multiple_order_status(self, order_ids):
+        return {str(order_id): {'status': self.statuses[str(order_id)]} for order_id in order_ids}
+
+
+class RecordingDriver:
+    """SELECT_ORDERS_SCRIPT에 넘긴 대상 주문번호를 기록하고, 모두 선택된 것으로 돌려준다."""
+
+    def __init__(self):
+        self.targets = None
+
+    def execute_script(self, script, targets):
+        self.targets = targets
+        return targets
+
+
+def order_row(market_order_cell, store_order_id, status):
+    return [
+        market_order_cell, store_order_id, '홍길동\n010-0000-0000\nuser01', '상품', '옵션', '1', 'https://example.com',
+        '서비스', '2024-01-01\n(2024-01-01 10:00:00)', status, ''
+    ]
+
+
+def scraped_order(num):
+    return {'market_order_num': num, 'scraped_order_num': num, 'checkbox_id': num, 'check_element': None}
+
+
+def make_sheet_manager(rows):
+    shipping = InMemoryWorksheet('market_store_order_list', [SHIPPING_ORDER_HEADER, *rows])
+    manual = InMemoryWorksheet('manual_order_list', [MANUAL_ORDER_HEADER])
+    return FakeSheetManager([shipping, manual])
+
+
+# 시트 셀에 주문번호가 여러 개 있어도 체크박스 선택과 상태 기록은 크롤링한 주문번호로 한다
+def test_multi_number_cell_keeps_scraped_order_num(tmp_path):
+    sheet_manager = make_sheet_manager([order_row('20240101-0000002\n20240101-0000003', '1', '배송중')])
+    orders = [scraped_order('20240101-0000003')]
+    state_store = OrderStateStore(str(tmp_path / 'state.sqlite3'))
+
+    processed, _ = asyncio.run(ac.check_order(
+        orders, ac.get_shipping_order_data(sheet_manager), FakeStoreAPI({'1': 'Completed'}), state_store=state_store
+    ))
+    assert [order['scraped_order_num'] for order in processed] == ['20240101-0000003']
+    assert processed[0]['sheet_market_order_num'] == '20240101-0000002\n20240101-0000003'
+
+    driver = RecordingDriver()
+    assert ac.select_order_checkboxes(driver, processed) == {'20240101-0000003'}
+    assert driver.targets == ['20240101-0000003']
+
+    assert ac.process_orders(sheet_manager, processed, state_store, lock_path=str(tmp_path / 'sheet.lock'))[0]
+    assert state_store.with_action(['20240101-0000003', '20240101-0000002'], 'sheet_marked') == {'20240101-0000003'}
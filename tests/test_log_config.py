@@ -0,0 +1,28 @@
+import sys
+import json
+import queue
+import logging
+
+from log_config import JsonFormatter, KSTFormatter, TracebackQueueHandler
+
+
+def _queued_exception_record():
+    handler = TracebackQueueHandler(queue.SimpleQueue())
+    try:
+        raise ValueError('잘못된 값')
+    except ValueError:
+        record = logging.LogRecord('test', logging.ERROR, __file__, 1, '주문 %s 처리 실패', ('1',), None)
+        record.exc_info = sys.exc_info()
+    return handler.prepare(record)
+
+
+# 큐를 거친 레코드도 traceback이 메시지가 아니라 exception 필드에 남는다
+def test_json_log_keeps_traceback_in_exception_field():
+    entry = json.loads(JsonFormatter().format(_queued_exception_record()))
+    assert entry['message'] == '주문 1 처리 실패'
+    assert 'ValueError: 잘못된 값' in entry['exception']
+
+
+def test_text_log_appends_traceback():
+    text = KSTFormatter('%(message)s').format(_queued_exception_record())
+    assert text.startswith('주문 1 처리 실패\nTraceback')
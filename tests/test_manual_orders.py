@@ -0,0 +1,60 @@
+import socket
+
+import requests
+
+import automation_check as ac
+from state_store import OrderStateStore
+from bench.fakes import FakeSheetManager, InMemoryWorksheet, MANUAL_ORDER_HEADER
+
+
+def manual_order(num, store_order_id, status='Canceled'):
+    return [
+        num, store_order_id, '홍길동\n010-0000-0000\nuser01', '상품', '옵션', '1', 'https://example.com',
+        '서비스', '2024-01-01\n(2024-01-01 10:00:00)', '배송중', '', status
+    ]
+
+
+def make_sheet_manager(orders):
+    rows = [MANUAL_ORDER_HEADER] + [order[:9] + ['처리필요', ''] for order in orders]
+    return FakeSheetManager([InMemoryWorksheet('manual_order_list', rows)])
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/hook"
+
+
+def test_unreachable_webhook_does_not_raise(tmp_path):
+    orders = [manual_order('20240101-0000001', '1'), manual_order('20240101-0000002', '2')]
+    state_store = OrderStateStore(str(tmp_path / 'state.sqlite3'))
+    dispatcher = ac.ManualOrderDispatcher(closed_port_url())
+
+    assert dispatcher.dispatch(make_sheet_manager(orders), orders, state_store) == 0
+    assert state_store.with_action(['20240101-0000001', '20240101-0000002'], 'alert_sent') == set()
+
+
+# 한 건이 실패해도 보낸 알림은 기록되어 다음 실행에서 다시 보내지 않는다
+def test_sent_alerts_are_recorded_when_one_fails(tmp_path, fake_server):
+    orders = [manual_order(f"20240101-000000{i}", str(i)) for i in range(1, 5)]
+    state_store = OrderStateStore(str(tmp_path / 'state.sqlite3'))
+    dispatcher = ac.ManualOrderDispatcher(f"{fake_server.base_url}/hook")
+    post = dispatcher.session.post
+
+    def flaky_post(url, json, **kwargs):
+        if json['order_num'] == '20240101-0000003':
+            raise requests.ConnectionError('connection refused')
+        return post(url, json=json, **kwargs)
+
+    dispatcher.session.post = flaky_post
+    sheet_manager = make_sheet_manager(orders)
+    assert dispatcher.dispatch(sheet_manager, orders, state_store) == 3
+    assert state_store.with_action([order[0] for order in orders], 'alert_sent') == {
+        '20240101-0000001', '20240101-0000002', '20240101-0000004'
+    }
+
+    # 새 프로세스(새 전송기)에서도 실패한 한 건만 다시 보낸다
+    dispatcher = ac.ManualOrderDispatcher(f"{fake_server.base_url}/hook")
+    assert dispatcher.dispatch(sheet_manager, orders, state_store) == 1
+    assert len(fake_server.webhook_payloads) == 4
+    assert fake_server.webhook_payloads[-1]['order_num'] == '20240101-0000003'
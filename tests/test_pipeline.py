@@ -0,0 +1,58 @@
+import os
+import asyncio
+
+import automation_check as ac
+import cafe24_http
+import run_journal
+from state_store import OrderStateStore
+
+
+def run_pipeline(mall):
+    run_stats = {}
+    processed = asyncio.run(ac.main(run_stats=run_stats, mall=mall))
+    return processed, run_stats
+
+
+# 시트는 배송완료로 바꿨는데 배송완료 처리가 실패하면, 실행 기록이 만료된 다음 실행에서도 다시 처리된다
+def test_failed_eship_is_retried_next_run(http_pipeline, fake_server):
+    mall, sheet_manager = http_pipeline
+    fake_server.eship_failures = 1
+
+    processed, run_stats = run_pipeline(mall)
+    assert run_stats.get('failed')
+    assert fake_server.shipped_ids == []
+    shipping_rows = sheet_manager.get_worksheet('market_store_order_list').rows[1:]
+    assert all(row[9] == '배송완료' for row in shipping_rows)
+
+    # 실행 기록이 만료된 것처럼 처음부터 다시 실행
+    os.remove(mall.path_for(ac.RUN_JOURNAL_PATH))
+    processed, run_stats = run_pipeline(mall)
+    assert not run_stats.get('failed')
+    assert len(processed) == fake_server.admin_rows
+    assert sorted(fake_server.shipped_ids) == sorted(f"chk-{i}" for i in range(fake_server.admin_rows))
+
+    state_store = OrderStateStore(mall.path_for(ac.STATE_DB_PATH))
+    order_nums = [order['scraped_order_num'] for order in processed]
+    assert state_store.with_pending_action(order_nums, 'sheet_marked', 'eship_clicked') == set()
+    state_store.close()
+
+
+# 배송완료 요청 필드 이름이 배송중 목록과 다르면 시트를 바꾸기 전에 실패한다
+def test_wrong_eship_field_fails_before_sheet_update(http_pipeline, fake_server, monkeypatch):
+    mall, sheet_manager = http_pipeline
+    monkeypatch.setattr(cafe24_http, 'CAFE24_ESHIP_ORDER_FIELD', 'wrong[]')
+    monkeypatch.setitem(run_journal.STAGE_RETRY_BUDGETS, 'scrape', (1, 0))
+
+    processed, run_stats = run_pipeline(mall)
+    assert run_stats.get('failed')
+    shipping_rows = sheet_manager.get_worksheet('market_store_order_list').rows[1:]
+    assert all(row[9] == '배송중' for row in shipping_rows)
+    assert fake_server.counters['admin.shipping_complete'] == 0
+
+
+# API 연결 준비는 사용량에 잡히는 API 호출 없이 연결만 맺는다
+def test_store_api_warm_up_makes_no_api_call(http_pipeline, fake_server):
+    mall, _ = http_pipeline
+    run_pipeline(mall)
+    assert fake_server.counters['head'] == 1
+    assert 'api.balance' not in fake_server.counters
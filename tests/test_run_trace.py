@@ -0,0 +1,47 @@
+import asyncio
+
+import automation_check as ac
+import run_trace
+from state_store import OrderStateStore, StatusCache
+from test_check_order import FakeStoreAPI, order_row, scraped_order, make_sheet_manager
+
+
+# 상태 캐시에서 읽은 상태와 state_store의 확인 대상 판단까지 기록해서 다시 실행해도 같은 결과가 나온다
+def test_replay_matches_recorded_run_with_cache_hits(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_trace, 'TRACE_DIR', str(tmp_path / 'traces'))
+    sheet_manager = make_sheet_manager([
+        order_row('20240101-0000001', '1', '배송중'),  # 캐시: 완료
+        order_row('20240101-0000002', '2', '배송중'),  # API: 완료
+        order_row('20240101-0000003', '3', '배송중'),  # 캐시: 취소 (수동처리)
+        order_row('20240101-0000004', '4', '배송중'),  # 아직 다시 확인할 시점이 아님
+        order_row('20240101-0000005', '5', '배송완료'),  # 시트 표시만 끝나고 배송완료 버튼 처리가 남음
+    ])
+    orders = [scraped_order(f'20240101-000000{i}') for i in range(1, 6)]
+
+    status_cache = StatusCache(str(tmp_path / 'state.sqlite3'))
+    status_cache.put({'1': {'status': 'Completed'}, '3': {'status': 'Canceled'}})
+    state_store = OrderStateStore(str(tmp_path / 'state.sqlite3'))
+    state_store.record_scraped(['20240101-0000004'])
+    state_store.schedule_recheck('20240101-0000004')
+    state_store.mark_action(['20240101-0000005'], 'sheet_marked')
+    store_api = FakeStoreAPI({'2': 'Completed', '4': 'Completed', '5': 'Completed'})
+
+    recorder = run_trace.start_recording('run-1')
+    for name in ('market_store_order_list', 'manual_order_list'):
+        run_trace.record_sheet(name, sheet_manager.get_worksheet(name).get_all_values())
+    run_trace.record_scraped(orders)
+    processed, manual = asyncio.run(ac.check_order(
+        orders, ac.get_shipping_order_data(sheet_manager), store_api,
+        status_cache=status_cache, state_store=state_store
+    ))
+    ac.process_orders(sheet_manager, processed, state_store, lock_path=str(tmp_path / 'sheet.lock'))
+    run_trace.stop_recording()
+
+    assert sorted(order['scraped_order_num'] for order in processed) == [
+        '20240101-0000001', '20240101-0000002', '20240101-0000005'
+    ]
+    assert len(manual) == 1
+
+    result = run_trace.replay(recorder.path)
+    assert result['processed_orders'] == len(processed)
+    assert result['manual_orders'] == len(manual)
@@ -0,0 +1,62 @@
+import logging
+
+import pytest
+
+import automation_check as ac
+
+
+def make_fetch(total, ignore_limit_after=None):
+    """배송중 주문 total건 목록. ignore_limit_after가 있으면 페이지 크기와 상관없이 그만큼만 보여준다."""
+    requested = []
+
+    def fetch(limit):
+        requested.append(limit)
+        return list(range(min(total, ignore_limit_after or limit)))
+
+    return fetch, requested
+
+
+def test_with_page_limit_keeps_repeated_filters():
+    url = ac.with_page_limit('https://mall.example/admin/shipping?orderStatus[]=N30&orderStatus[]=N40&limit=20', 500)
+    assert url == 'https://mall.example/admin/shipping?orderStatus%5B%5D=N30&orderStatus%5B%5D=N40&limit=500'
+
+
+def test_with_page_limit_param_name():
+    assert ac.with_page_limit('https://mall.example/list?a=1', 50, param='page_size') == \
+        'https://mall.example/list?a=1&page_size=50'
+
+
+def test_partial_page_is_read_once():
+    fetch, requested = make_fetch(30)
+    assert len(ac.read_all_pages(fetch, limit=50)) == 30
+    assert requested == [50]
+
+
+def test_full_page_grows_until_everything_is_read():
+    fetch, requested = make_fetch(120)
+    assert len(ac.read_all_pages(fetch, limit=50)) == 120
+    assert requested == [50, 100, 200]
+
+
+# 주문 수가 페이지 크기의 배수여도 읽지 못한 주문이 있다고 보고하지 않는다
+@pytest.mark.parametrize('total', [50, 100])
+def test_exact_multiple_is_not_reported(total, caplog):
+    fetch, _ = make_fetch(total)
+    with caplog.at_level(logging.WARNING):
+        assert len(ac.read_all_pages(fetch, limit=50)) == total
+    assert not caplog.records
+
+
+def test_ignored_limit_param_is_warned(caplog):
+    fetch, _ = make_fetch(120, ignore_limit_after=50)
+    with caplog.at_level(logging.WARNING):
+        assert len(ac.read_all_pages(fetch, limit=50)) == 50
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+    assert '무시' in caplog.records[0].getMessage()
+
+
+def test_max_limit_is_reported(caplog):
+    fetch, _ = make_fetch(1000)
+    with caplog.at_level(logging.WARNING):
+        assert len(ac.read_all_pages(fetch, limit=50, max_limit=100)) == 100
+    assert [record.levelno for record in caplog.records] == [logging.ERROR]
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli
+
+
+# 명령마다 처음 import하는 모듈이 새 프로세스에서 STARTUP_BUDGET 안에 import되어야 한다
+@pytest.mark.parametrize('command, module', sorted(cli.COMMAND_MODULES.items()))
+def test_command_import_within_budget(command, module):
+    seconds = cli.measure_import_time(module)
+    assert seconds <= cli.STARTUP_BUDGET, f"{command}: {module} import {seconds:.3f}초 (목표 {cli.STARTUP_BUDGET}초)"